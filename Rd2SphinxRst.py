@@ -1,26 +1,290 @@
 import argparse
+import glob
+import os
+import sys
 
+from src.archive import ARCHIVE_FORMATS, ArchiveError, is_archive, iter_rd_files, open_writer
+from src.batch import BatchBuilder, BatchError, load_batch_manifest
+from src.limits import DEFAULT_LIMITS, Limits
 from src.man_reader import ManReader
+from src.profiler import profiler
+from src.render_cache import format_stats
+from src.renderers import DEFAULT_FORMATS, parse_formats
+from src.shard import SHARD_FILENAME, ShardError, merge_shards, parse_shard
+from src.toctree_reader import MissingFunctionError
 
 # python Rd2SphinxRst.py ~/Desktop/mxnet/man/ ~/Desktop/mxnet/toctree ~/Desktop/mxnet/doc2/ --url http://github.com/apache/incubator-mxnet/blob/master/
+# python Rd2SphinxRst.py ~/Desktop/mxnet/man/ ~/Desktop/mxnet/doc2/ --shard 1/4 --url http://github.com/apache/incubator-mxnet/blob/master/
+# python Rd2SphinxRst.py merge ~/Desktop/mxnet/toctree ~/Desktop/mxnet/doc2/
+# python Rd2SphinxRst.py batch ~/Desktop/docs/batch.json --jobs 0
+
+# The commands given as first argument instead of a man_dir
+COMMANDS = ("merge", "batch")
 
 def parse_args():
     parser = argparse.ArgumentParser(
+        usage='%(prog)s [options] man_dir toctree_dir output_dir\n'
+              '       %(prog)s [options] man_dir output_dir --shard i/N\n'
+              '       %(prog)s merge|batch ...',
         description='Convert R Markdown to Sphinx compatible RST files.')
     parser.add_argument('man_dir', type=str,
-                        help='Directory of the R Markdown files')
+                        help='Directory of the R Markdown files, or a tar or zip archive '
+                             'of them, "-" reads a tar archive from stdin')
     parser.add_argument('toctree_dir', type=str,
-                        help='Directory of the Toctree files')
-    parser.add_argument('output_dir', type=str,
-                        help='Directory to put the RST files')
+                        help='Directory of the Toctree files, not needed with --shard')
+    parser.add_argument('output_dir', type=str, nargs='?',
+                        help='Directory to put the RST files, or a tar or zip archive '
+                             'to write them to, "-" writes a tar archive to stdout')
     parser.add_argument('--url', type=str,
                         help="Base URL of the repository")
-    return parser.parse_args()
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Number of processes converting the files, 0 uses every core")
+    parser.add_argument('--formats', type=formats_type, default=DEFAULT_FORMATS,
+                        help='Comma separated formats of the pages of the Rd files, '
+                             'among rst, md (MyST Markdown) and json, e.g. rst,md,json. '
+                             'Each file is parsed once for all the formats, the toctree '
+                             'pages are only written in RST')
+    parser.add_argument('--io-threads', type=int, default=0,
+                        help='Number of threads reading the Rd files and of threads '
+                             'writing the RST files, overlapping the file accesses with '
+                             'the conversion, e.g., on network filesystems. 0 reads and '
+                             'writes one file at a time')
+    parser.add_argument('--max-file-size', type=float,
+                        default=DEFAULT_LIMITS.max_size / 1024 / 1024,
+                        help='Largest Rd file converted, in MB, larger ones are reported '
+                             'and skipped. 0 disables the limit')
+    parser.add_argument('--max-file-seconds', type=float,
+                        default=DEFAULT_LIMITS.max_seconds,
+                        help='Longest time spent converting an Rd file, slower ones are '
+                             'reported and skipped. 0 disables the limit')
+    parser.add_argument('--allow-skipped', action='store_true',
+                        help="Exit with 0 even if Rd files were skipped")
+    parser.add_argument('--force', action='store_true',
+                        help="Convert every file, even the ones unchanged since the last build")
+    parser.add_argument('--cache-dir', type=str,
+                        help="Directory of the cache of parsed Rd files")
+    parser.add_argument('--profile', type=str,
+                        help="JSON file to save the time spent by each file in each stage, "
+                             "also prints the hit rate of the render cache")
+    parser.add_argument('--profile-top', type=int, default=20,
+                        help="Number of slowest files listed in the profile")
+    parser.add_argument('--cprofile', type=str,
+                        help="File to save cProfile statistics of the run")
+    parser.add_argument('--watch', action='store_true',
+                        help="Keep running and reconvert the Rd and toctree files when they change")
+    parser.add_argument('--archive-format', type=str, choices=ARCHIVE_FORMATS,
+                        help="Format of the output archive, by default the one of the "
+                             "extension of output_dir, and tar for stdout")
+    parser.add_argument('--shard', type=shard_type,
+                        help="Only convert the shard i of N of the Rd files, e.g. 1/4, "
+                             "and write the shard file read by the merge command instead "
+                             "of the toctree pages")
+    args = parser.parse_args()
+    if args.output_dir is None:
+        if not args.shard:
+            parser.error("the following arguments are required: output_dir")
+        # A shard does not read the toctree files, the second path is output_dir
+        args.toctree_dir, args.output_dir = None, args.toctree_dir
+    if (args.archive_format or is_archive(args.output_dir)) and os.path.isdir(args.output_dir):
+        parser.error("output_dir {} is a directory, an archive cannot be written to "
+                     "it".format(args.output_dir))
+    if args.watch and use_archives(args):
+        parser.error("--watch needs directories, not archives")
+    if args.shard and (args.watch or use_archives(args)):
+        parser.error("--shard needs directories and cannot be used with --watch")
+    return args
+
+def parse_merge_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='Rd2SphinxRst.py merge',
+        description='Write the toctree pages of a build sharded with --shard i/N, '
+                    'once the RST and shard files of every shard are in output_dir.')
+    parser.add_argument('toctree_dir', type=str,
+                        help='Directory of the Toctree files')
+    parser.add_argument('output_dir', type=str,
+                        help='Directory holding the RST files of every shard')
+    parser.add_argument('shard_files', type=str, nargs='*',
+                        help='Shard files, by default the ones in output_dir')
+    parser.add_argument('--allow-skipped', action='store_true',
+                        help="Exit with 0 even if Rd files were skipped")
+    return parser.parse_args(argv)
+
+def parse_batch_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='Rd2SphinxRst.py batch',
+        description='Convert several packages in one run, sharing one pool of '
+                    'processes, and write a combined index of their functions.')
+    parser.add_argument('manifest', type=str,
+                        help='JSON batch manifest listing the man_dir, toctree_dir, '
+                             'output_dir and url of every package')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Number of processes converting the files, 0 uses every core")
+    parser.add_argument('--formats', type=formats_type, default=DEFAULT_FORMATS,
+                        help='Comma separated formats of the pages of the Rd files, '
+                             'among rst, md (MyST Markdown) and json, e.g. rst,md,json. '
+                             'Each file is parsed once for all the formats, the toctree '
+                             'pages are only written in RST')
+    parser.add_argument('--max-file-size', type=float,
+                        default=DEFAULT_LIMITS.max_size / 1024 / 1024,
+                        help='Largest Rd file converted, in MB, larger ones are reported '
+                             'and skipped. 0 disables the limit')
+    parser.add_argument('--max-file-seconds', type=float,
+                        default=DEFAULT_LIMITS.max_seconds,
+                        help='Longest time spent converting an Rd file, slower ones are '
+                             'reported and skipped. 0 disables the limit')
+    parser.add_argument('--allow-skipped', action='store_true',
+                        help="Exit with 0 even if Rd files were skipped")
+    parser.add_argument('--force', action='store_true',
+                        help="Convert every file, even the ones unchanged since the last build")
+    parser.add_argument('--cache-dir', type=str,
+                        help="Directory of the cache of parsed Rd files")
+    parser.add_argument('--profile', type=str,
+                        help="JSON file to save the time spent by each file in each stage, "
+                             "also prints the hit rate of the render cache")
+    parser.add_argument('--profile-top', type=int, default=20,
+                        help="Number of slowest files listed in the profile")
+    return parser.parse_args(argv)
+
+def formats_type(formats):
+    try:
+        return parse_formats(formats)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+
+def shard_type(shard):
+    try:
+        return parse_shard(shard)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+
+def use_archives(args):
+    return is_archive(args.man_dir) or is_archive(args.output_dir) or \
+        args.archive_format is not None
+
+def get_limits(args):
+    return Limits(max_size=int(args.max_file_size * 1024 * 1024),
+                  max_seconds=args.max_file_seconds)
+
+def print_skipped(skipped):
+    '''
+    Reports the Rd files skipped by the build on stderr.
+    '''
+    if skipped:
+        print("Skipped {} Rd files:".format(len(skipped)), file=sys.stderr)
+        for filename, error in sorted(skipped.items()):
+            print("    {}: {}".format(filename, error), file=sys.stderr)
+
+def exit_if_skipped(skipped, args):
+    '''
+    Exits with an error when the build skipped Rd files, unless --allow-skipped
+    was given, so that a build skipping files does not pass as a successful one.
+    '''
+    if skipped and not args.allow_skipped:
+        sys.exit("{} Rd files were skipped, use --allow-skipped to accept it".format(
+            len(skipped)))
+
+def convert(args):
+    mr = ManReader(args.man_dir, jobs=args.jobs, cache_dir=args.cache_dir,
+                   io_threads=args.io_threads, limits=get_limits(args),
+                   formats=args.formats)
+    if use_archives(args):
+        with open_writer(args.output_dir, args.archive_format) as writer:
+            mr.write_rst_archive(iter_rd_files(args.man_dir), writer, args.toctree_dir,
+                                 url=args.url)
+    elif args.shard:
+        mr.write_rst_shard(args.output_dir, *args.shard, url=args.url)
+    else:
+        mr.write_rst(args.output_dir, args.toctree_dir, url=args.url, force=args.force)
+    return mr
+
+def merge(argv):
+    args = parse_merge_args(argv)
+    shard_files = args.shard_files or sorted(
+        glob.glob(os.path.join(args.output_dir, SHARD_FILENAME.format("*", "*"))))
+    try:
+        skipped = merge_shards(shard_files, args.toctree_dir, args.output_dir)
+    except (MissingFunctionError, ShardError) as error:
+        sys.exit(str(error))
+    print_skipped(skipped)
+    exit_if_skipped(skipped, args)
+
+def batch(argv):
+    args = parse_batch_args(argv)
+    try:
+        packages, index_path = load_batch_manifest(args.manifest)
+    except BatchError as error:
+        sys.exit(str(error))
+    if args.profile:
+        profiler.enable()
+    builder = BatchBuilder(packages, index_path, jobs=args.jobs, cache_dir=args.cache_dir,
+                           limits=get_limits(args), formats=args.formats)
+    errors = builder.build(force=args.force)
+    print_skipped(builder.skipped)
+    if args.profile:
+        profiler.write_report(args.profile, top=args.profile_top)
+        print(format_stats(builder.render_stats))
+    if args.cache_dir:
+        print("Parse cache: {} hits, {} misses".format(builder.cache_hits,
+                                                       builder.cache_misses))
+    if errors:
+        sys.exit("\n".join("{}: {}".format(name, error)
+                           for name, error in sorted(errors.items())))
+    exit_if_skipped(builder.skipped, args)
+
+def get_command(argv):
+    '''
+    Returns the command given as first argument, one of COMMANDS, or None to
+    convert a man_dir. Exits with an error if it is also a directory of Rd
+    files, which must then be given as a path, e.g., ./merge.
+    '''
+    if not argv or argv[0] not in COMMANDS:
+        return None
+    if glob.glob(os.path.join(argv[0], "*.Rd")):
+        sys.exit("{0} is both a command and a directory of Rd files: give the directory "
+                 "as ./{0} to convert it, or run {0} from another directory".format(argv[0]))
+    return argv[0]
 
 def run():
+    command = get_command(sys.argv[1:])
+    if command == "merge":
+        merge(sys.argv[2:])
+        return
+    if command == "batch":
+        batch(sys.argv[2:])
+        return
     args = parse_args()
-    mr = ManReader(args.man_dir)
-    mr.write_rst(args.output_dir, args.toctree_dir, url=args.url)
+    if args.watch:
+        from src.watcher import Watcher
+        mr = ManReader(args.man_dir, jobs=args.jobs, cache_dir=args.cache_dir,
+                       io_threads=args.io_threads, limits=get_limits(args),
+                       formats=args.formats)
+        Watcher(mr, args.man_dir, args.toctree_dir, args.output_dir,
+                url=args.url).run(force=args.force)
+        # The files still skipped by the last rebuild
+        exit_if_skipped(mr.skipped, args)
+        return
+    if args.profile:
+        profiler.enable()
+    try:
+        if args.cprofile:
+            import cProfile
+            cprofiler = cProfile.Profile()
+            mr = cprofiler.runcall(convert, args)
+            cprofiler.dump_stats(args.cprofile)
+        else:
+            mr = convert(args)
+    except (ArchiveError, MissingFunctionError) as error:
+        sys.exit(str(error))
+    print_skipped(mr.skipped)
+    # stdout may be the output archive
+    log = sys.stderr if args.output_dir == "-" else sys.stdout
+    if args.profile:
+        profiler.write_report(args.profile, top=args.profile_top)
+        print(format_stats(mr.render_stats), file=log)
+    if args.cache_dir:
+        print("Parse cache: {} hits, {} misses".format(mr.cache_hits, mr.cache_misses),
+              file=log)
+    exit_if_skipped(mr.skipped, args)
 
 if __name__ == "__main__":
     run()
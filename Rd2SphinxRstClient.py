@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import socket
+import sys
+
+# Thin client of Rd2SphinxRstServer.py, it only imports the standard library
+# so that its startup stays cheap.
+# python Rd2SphinxRstClient.py /tmp/rd2sphinxrst.sock convert ~/Desktop/mxnet/man/mx.nd.abs.Rd
+# python Rd2SphinxRstClient.py /tmp/rd2sphinxrst.sock build ~/Desktop/mxnet/man/ ~/Desktop/mxnet/toctree ~/Desktop/mxnet/doc2/
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Send a conversion request to Rd2SphinxRstServer.py.')
+    parser.add_argument('socket', type=str,
+                        help='Unix socket of the server')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert = subparsers.add_parser('convert', help='Convert a single Rd file')
+    convert.add_argument('rd_file', type=str,
+                         help='The R Markdown file')
+    convert.add_argument('--output-dir', type=str,
+                         help='Directory to put the RST file, printed if not given')
+    convert.add_argument('--url', type=str, default="",
+                         help="Base URL of the repository")
+
+    build = subparsers.add_parser('build', help='Convert a directory of Rd files')
+    build.add_argument('man_dir', type=str,
+                       help='Directory of the R Markdown files')
+    build.add_argument('toctree_dir', type=str,
+                       help='Directory of the Toctree files')
+    build.add_argument('output_dir', type=str,
+                       help='Directory to put the RST files')
+    build.add_argument('--url', type=str, default="",
+                       help="Base URL of the repository")
+    build.add_argument('--force', action='store_true',
+                       help="Convert every file, even the ones unchanged since the last build")
+    build.add_argument('--allow-skipped', action='store_true',
+                       help="Exit with 0 even if Rd files were skipped")
+
+    subparsers.add_parser('ping', help='Check that the server is running')
+    subparsers.add_parser('shutdown', help='Stop the server')
+    return parser.parse_args()
+
+def get_request(args):
+    '''
+    Builds the request from the command line arguments. Paths are made
+    absolute since the server may run in another directory.
+    '''
+    request = {"command": args.command}
+    if args.command == "convert":
+        request.update({"rd_file": os.path.abspath(args.rd_file), "url": args.url,
+                        "output_dir": args.output_dir and os.path.abspath(args.output_dir)})
+    elif args.command == "build":
+        request.update({"man_dir": os.path.abspath(args.man_dir),
+                        "toctree_dir": os.path.abspath(args.toctree_dir),
+                        "output_dir": os.path.abspath(args.output_dir),
+                        "url": args.url, "force": args.force})
+    return request
+
+def send(path, request):
+    '''
+    Sends a request to the server listening on path and returns its response.
+    '''
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(path)
+        with connection.makefile('w') as wfile, connection.makefile('r') as rfile:
+            wfile.write(json.dumps(request) + "\n")
+            wfile.flush()
+            return json.loads(rfile.readline())
+
+def run():
+    args = parse_args()
+    response = send(args.socket, get_request(args))
+    if not response["ok"]:
+        sys.exit(response["error"])
+    skipped = response.get("skipped", {})
+    for filename, error in sorted(skipped.items()):
+        print("Skipped {}: {}".format(filename, error), file=sys.stderr)
+    if skipped and not args.allow_skipped:
+        sys.exit("{} Rd files were skipped, use --allow-skipped to accept it".format(
+            len(skipped)))
+    if "rst" in response:
+        sys.stdout.write(response["rst"])
+
+if __name__ == "__main__":
+    run()
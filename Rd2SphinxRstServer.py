@@ -0,0 +1,29 @@
+import argparse
+import sys
+
+from src.server import ConversionServer
+
+# python Rd2SphinxRstServer.py --socket /tmp/rd2sphinxrst.sock
+# python Rd2SphinxRstClient.py /tmp/rd2sphinxrst.sock build ~/Desktop/mxnet/man/ ~/Desktop/mxnet/toctree ~/Desktop/mxnet/doc2/
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Keep the converter loaded and answer JSON lines conversion requests.')
+    parser.add_argument('--socket', type=str,
+                        help="Unix socket to listen on, stdin/stdout if not given")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Number of processes used by the build requests")
+    parser.add_argument('--cache-dir', type=str,
+                        help="Directory of the cache of parsed Rd files")
+    return parser.parse_args()
+
+def run():
+    args = parse_args()
+    server = ConversionServer(jobs=args.jobs, cache_dir=args.cache_dir)
+    if args.socket:
+        server.serve_unix_socket(args.socket)
+    else:
+        server.serve_stream(sys.stdin, sys.stdout)
+
+if __name__ == "__main__":
+    run()
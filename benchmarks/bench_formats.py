@@ -0,0 +1,67 @@
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.corpus import write_corpus
+from src.rd_reader import RDReader
+from src.renderers import RENDERERS, parse_formats, render_pages
+
+# python benchmarks/bench_formats.py --files 1000 --formats rst,md,json
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Compare rendering every parsed Rd file in several formats with '
+                    'converting the files once per format.')
+    parser.add_argument('--files', type=int, default=1000,
+                        help='Number of Rd files of the generated corpus')
+    parser.add_argument('--formats', type=parse_formats, default=tuple(RENDERERS),
+                        help='Comma separated formats to render')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed runs, the fastest one is reported')
+    return parser.parse_args()
+
+def render_once(filenames, formats):
+    '''
+    Parses every file once and renders it in every format.
+    '''
+    for filename in filenames:
+        render_pages(RDReader(filename), "http://github.com/", formats)
+
+def convert_per_format(filenames, formats):
+    '''
+    Parses and renders every file once per format, as separate runs would.
+    '''
+    for output_format in formats:
+        for filename in filenames:
+            render_pages(RDReader(filename), "http://github.com/", (output_format,))
+
+def run():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        man_dir, _ = write_corpus(directory, args.files)
+        filenames = sorted(glob.glob(os.path.join(man_dir, "*.Rd")))
+        print("{:<28} {:>10} {:>14}".format("", "seconds", "ms per file"))
+        results = {}
+        for name, func in [("parse once, render each", render_once),
+                           ("one conversion per format", convert_per_format)]:
+            results[name] = min(timeit.repeat(lambda: func(filenames, args.formats),
+                                              number=1, repeat=args.repeat))
+            print("{:<28} {:>10.3f} {:>14.3f}".format(
+                name, results[name], results[name] / len(filenames) * 1e3))
+        for output_format in args.formats:
+            seconds = min(timeit.repeat(
+                lambda: convert_per_format(filenames, (output_format,)),
+                number=1, repeat=args.repeat))
+            print("{:<28} {:>10.3f} {:>14.3f}".format(
+                "conversion to " + output_format, seconds, seconds / len(filenames) * 1e3))
+    print("Rendering {} formats from one parse is {:.2f}x faster".format(
+        len(args.formats), results["one conversion per format"] /
+        results["parse once, render each"]))
+
+if __name__ == "__main__":
+    run()
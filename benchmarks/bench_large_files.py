@@ -0,0 +1,117 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.corpus import make_rd
+from src import rd_reader
+from src.parse_cache import ParseCache
+from src.rd_reader import RDReader
+from src.rst_builder import RSTBuilder
+
+# python benchmarks/bench_large_files.py --sizes 4 16 64
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Compare the peak memory and time of converting large Rd files '
+                    'read as text with the ones of the mmap scan of their bytes, and '
+                    'check that both give the same RST and are found in the parse '
+                    'cache once touched. Exits with 1 otherwise.')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[4, 16, 64],
+                        help='Sizes of the examples of each generated Rd file, in MB')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed runs, the fastest one is reported')
+    return parser.parse_args()
+
+def make_large_rd(size):
+    '''
+    Returns a generated Rd file whose examples, never rendered, are about
+    size bytes long, with non-ASCII comments so that decoding is not trivial.
+    '''
+    _, content = make_rd(0, random.Random(0), examples_lines=1)
+    line = "x <- mx.nd.array(c(1, 2)) # µ-law, 2×2 ≥ 0\n"
+    examples = "\\examples{\n" + line * (size // len(line.encode("utf-8"))) + "}\n"
+    return content + examples + "\\keyword{internal}\n"
+
+def convert(filename, large_file_size):
+    '''
+    Converts an Rd file, scanning its bytes if it has at least
+    large_file_size bytes.
+    '''
+    rd_reader.LARGE_FILE_SIZE = large_file_size
+    return RSTBuilder(RDReader(filename), "http://github.com/").rst_string
+
+def measure(filename, large_file_size, repeat):
+    '''
+    Returns the RST of the file, the peak memory of its conversion in bytes
+    and the fastest time of the conversion in seconds.
+    '''
+    tracemalloc.start()
+    rst_string = convert(filename, large_file_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    seconds = min(timeit.repeat(lambda: convert(filename, large_file_size),
+                                number=1, repeat=repeat))
+    return rst_string, peak, seconds
+
+def check_parse_cache(directory, large_filename):
+    '''
+    Returns the files whose ParseCache entry is not used once they are
+    touched, parsed from their text or bytes, e.g., a file with CRLF newlines
+    or a large file scanned as bytes.
+    '''
+    _, content = make_rd(0, random.Random(0), examples_lines=5)
+    filenames = [large_filename]
+    for name, newline in (("mx.nd.lf.Rd", "\n"), ("mx.nd.crlf.Rd", "\r\n")):
+        filenames.append(os.path.join(directory, name))
+        with open(filenames[-1], 'w', newline=newline) as f:
+            f.write(content)
+    missed = []
+    for filename in filenames:
+        for as_bytes in (False, True):
+            cache = ParseCache(os.path.join(directory, "cache-{}-{}".format(
+                os.path.basename(filename), as_bytes)))
+            with open(filename, 'rb') as f:
+                file_content = f.read() if as_bytes else None
+            RDReader(filename, cache=cache, file_content=file_content)
+            stat = os.stat(filename)
+            os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            if not RDReader(filename, cache=cache).from_cache:
+                missed.append("{} ({})".format(os.path.basename(filename),
+                                               "bytes" if as_bytes else "read"))
+            cache.close()
+    return missed
+
+def run():
+    args = parse_args()
+    default_size = rd_reader.LARGE_FILE_SIZE
+    failed = False
+    print("{:>8} {:>14} {:>14} {:>10} {:>10} {:>10} {:>8}".format(
+        "MB", "text peak KB", "mmap peak KB", "text s", "mmap s", "speedup", "RST"))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            filename = os.path.join(directory, "mx.nd.large.Rd")
+            with open(filename, 'w') as f:
+                f.write(make_large_rd(int(size * 1024 * 1024)))
+            text_rst, text_peak, text_seconds = measure(filename, float("inf"), args.repeat)
+            mmap_rst, mmap_peak, mmap_seconds = measure(filename, default_size, args.repeat)
+            same = text_rst == mmap_rst
+            failed = failed or not same
+            print("{:>8.1f} {:>14.1f} {:>14.1f} {:>10.4f} {:>10.4f} {:>9.1f}x {:>8}".format(
+                os.path.getsize(filename) / 1024 / 1024, text_peak / 1024, mmap_peak / 1024,
+                text_seconds, mmap_seconds, text_seconds / mmap_seconds,
+                "same" if same else "DIFFERS"))
+        rd_reader.LARGE_FILE_SIZE = default_size
+        missed = check_parse_cache(directory, filename)
+    for name in missed:
+        print("Not found in the parse cache once touched: {}".format(name))
+    if failed or missed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    run()
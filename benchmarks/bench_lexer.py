@@ -0,0 +1,83 @@
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.rd_reader import RDReader
+
+# python benchmarks/bench_lexer.py --items 1000 2000 4000 8000 16000
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Check that RDReader.parse_file skips the braces of strings in '
+                    'R-like text and benchmark it on Rd files with many items.')
+    parser.add_argument('--items', type=int, nargs='+',
+                        default=[1000, 2000, 4000, 8000, 16000],
+                        help='Number of \\item in the arguments of each file')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of timed runs, the fastest one is reported')
+    return parser.parse_args()
+
+def make_rd(n_items):
+    '''
+    Builds the content of a Roxygen2 style Rd file with n_items arguments.
+    '''
+    items = "\n\n".join(
+        "\\item{{arg_{i}}}{{NDArray-or-Symbol\nThe input \\code{{{{arg_{i}}}}}.}}".format(i=i)
+        for i in range(n_items))
+    return ("\\name{{mx.nd.op}}\n\\alias{{mx.nd.op}}\n\\title{{Operator}}\n"
+            "\\usage{{\nmx.nd.op(...)\n}}\n\\arguments{{\n{items}\n}}\n"
+            "\\description{{\nOperator\n}}\n".format(items=items))
+
+# Rd files with braces in the strings of R-like text, which R's Rd parser does
+# not count, and the usage, arguments and description expected from them
+STRING_CASES = [
+    ('\\name{glue}\n\\alias{glue}\n\\title{Glue}\n'
+     '\\usage{\nglue(..., .sep = "", .open = "{")\n}\n'
+     '\\arguments{\n\\item{.open}{The opening delimiter, \\code{"{"}.}\n}\n'
+     '\\description{\nGlue strings\n}\n',
+     '\nglue(..., .sep = "", .open = "{")\n',
+     {".open": 'The opening delimiter, \\code{"{"}.'}, "\nGlue strings\n"),
+    ('\\name{a}\n\\alias{a}\n\\title{A}\n\\usage{\na(x, y = "}", z = \'\\\'{\', ...)\n}\n'
+     '\\arguments{\n\\item{y}{Don\'t use \\code{\'}\'}.}\n}\n\\description{\nA\n}\n',
+     '\na(x, y = "}", z = \'\\\'{\', ...)\n',
+     {"y": "Don't use \\code{'}'}."}, "\nA\n"),
+]
+
+def check_strings():
+    '''
+    Returns the number of STRING_CASES parsed wrongly, from the text and from
+    the bytes of the file.
+    '''
+    failures = 0
+    for content, usage, arguments, description in STRING_CASES:
+        for rd_text in (content, content.encode()):
+            rd_reader = RDReader.__new__(RDReader)
+            data = rd_reader.parse_file(rd_text)
+            try:
+                parsed = (data["usage"].string, dict(data["arguments"].items),
+                          data["description"].string)
+            except KeyError as error:
+                parsed = "missing {}".format(error)
+            if parsed != (usage, arguments, description):
+                print("Wrong sections for {!r}: {!r}".format(content, parsed))
+                failures += 1
+    return failures
+
+def run():
+    args = parse_args()
+    if check_strings():
+        sys.exit(1)
+    reader = RDReader.__new__(RDReader)
+    print("{:>10} {:>10} {:>12} {:>14}".format("items", "KB", "seconds", "us per item"))
+    for n_items in args.items:
+        content = make_rd(n_items)
+        seconds = min(timeit.repeat(lambda: reader.parse_file(content),
+                                    number=1, repeat=args.repeat))
+        print("{:>10} {:>10.1f} {:>12.4f} {:>14.2f}".format(
+            n_items, len(content) / 1024, seconds, seconds / n_items * 1e6))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,81 @@
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.corpus import write_corpus
+from src.man_reader import ManReader
+from src.rd_reader import RDReader
+
+# python benchmarks/bench_memory.py --files 200 1000 5000
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Measure the peak memory of ManReader.write_rst and the memory '
+                    'held by the parsed RDReaders.')
+    parser.add_argument('--files', type=int, nargs='+', default=[200, 1000, 5000],
+                        help='Number of Rd files to convert')
+    parser.add_argument('--examples', type=int, default=500,
+                        help='Maximum number of lines of the examples of each file')
+    parser.add_argument('--max-growth-kb', type=float, default=1.5,
+                        help='Largest growth of the peak memory per added file, in KB, '
+                             'between the two largest numbers of files, which should be '
+                             'over the 1024 fragments kept by the render cache. It is '
+                             'what the builds keep for each file: its entries of the '
+                             'function index, the manifest and the search index. A '
+                             'ManReader keeping the parsed files would grow by more than '
+                             'the RDReader KB/file')
+    return parser.parse_args()
+
+def measure_readers(man_dir):
+    '''
+    Returns the memory in bytes held by the RDReaders of every file in man_dir
+    and the size of the files.
+    '''
+    filenames = sorted(glob.glob(os.path.join(man_dir, "*.Rd")))
+    tracemalloc.start()
+    rd_readers = [RDReader(filename) for filename in filenames]
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return retained, sum(os.path.getsize(filename) for filename in filenames)
+
+def run():
+    args = parse_args()
+    print("{:>10} {:>14} {:>16} {:>18} {:>14}".format(
+        "files", "peak KB", "peak KB per file", "RDReader KB/file", "Rd KB/file"))
+    peaks = {}
+    for n_files in args.files:
+        with tempfile.TemporaryDirectory() as directory:
+            man_dir, toctree_dir = write_corpus(directory, n_files,
+                                                examples_lines=args.examples)
+            output_dir = os.path.join(directory, "output")
+            os.mkdir(output_dir)
+
+            tracemalloc.start()
+            ManReader(man_dir).write_rst(output_dir, toctree_dir, url="")
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            retained, input_size = measure_readers(man_dir)
+        print("{:>10} {:>14.1f} {:>16.2f} {:>18.2f} {:>14.2f}".format(
+            n_files, peak / 1024, peak / 1024 / n_files, retained / 1024 / n_files,
+            input_size / 1024 / n_files))
+        peaks[n_files] = peak
+
+    if len(peaks) < 2:
+        return
+    # The bounded render cache fills up with the first files, the growth
+    # between the largest sizes is the memory kept for each file
+    smaller, largest = sorted(peaks)[-2:]
+    growth = (peaks[largest] - peaks[smaller]) / 1024 / (largest - smaller)
+    print("Peak grows by {:.2f} KB per file from {} to {} files".format(
+        growth, smaller, largest))
+    if growth > args.max_growth_kb:
+        print("More than the limit of {:.2f} KB per file".format(args.max_growth_kb))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    run()
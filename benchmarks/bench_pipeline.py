@@ -0,0 +1,99 @@
+import argparse
+import builtins
+import contextlib
+import filecmp
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.corpus import write_corpus
+from src.man_reader import ManReader
+
+# python benchmarks/bench_pipeline.py --files 300 --latency 5 --io-threads 4 16
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Compare the serial conversion with the pipelined one of '
+                    '--io-threads on a filesystem where every file access is slow, '
+                    'as on NFS.')
+    parser.add_argument('--files', type=int, default=300,
+                        help='Number of Rd files of the generated corpus')
+    parser.add_argument('--latency', type=float, default=5.0,
+                        help='Milliseconds added to every open, stat and rename of the corpus')
+    parser.add_argument('--io-threads', type=int, nargs='+', default=[4, 16],
+                        help='Numbers of reader and writer threads to compare')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Number of processes converting the files')
+    return parser.parse_args()
+
+@contextlib.contextmanager
+def slow_filesystem(directory, latency):
+    '''
+    Makes every open, stat and rename of a path in directory sleep for
+    latency seconds first, standing in for the round trip of a network
+    filesystem. The sleep releases the GIL, like a blocking system call.
+    '''
+    directory = os.path.abspath(directory)
+
+    def slow(func):
+        def slow_func(path, *args, **kwargs):
+            if isinstance(path, str) and os.path.abspath(path).startswith(directory):
+                time.sleep(latency)
+            return func(path, *args, **kwargs)
+        return slow_func
+
+    patched = [(builtins, "open"), (os, "open"), (os, "stat"), (os, "replace")]
+    originals = [getattr(module, name) for module, name in patched]
+    for (module, name), original in zip(patched, originals):
+        setattr(module, name, slow(original))
+    try:
+        yield
+    finally:
+        for (module, name), original in zip(patched, originals):
+            setattr(module, name, original)
+
+def build(man_dir, toctree_dir, output_dir, jobs, io_threads):
+    '''
+    Returns the seconds of a full build into an empty output_dir and of a
+    second, incremental, build where nothing changed.
+    '''
+    os.mkdir(output_dir)
+    seconds = []
+    for _ in range(2):
+        start = time.perf_counter()
+        ManReader(man_dir, jobs=jobs, io_threads=io_threads).write_rst(
+            output_dir, toctree_dir, url="http://github.com/")
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+def run():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        man_dir, toctree_dir = write_corpus(directory, args.files)
+        print("{:>11} {:>12} {:>9} {:>18} {:>9}".format(
+            "io threads", "full build s", "speedup", "incremental build s", "speedup"))
+        results = {}
+        with slow_filesystem(directory, args.latency / 1000):
+            for io_threads in [0] + args.io_threads:
+                output_dir = os.path.join(directory, "output{}".format(io_threads))
+                results[io_threads] = build(man_dir, toctree_dir, output_dir,
+                                            args.jobs, io_threads)
+        for io_threads, (full, incremental) in results.items():
+            print("{:>11} {:>12.2f} {:>8.1f}x {:>18.2f} {:>8.1f}x".format(
+                io_threads, full, results[0][0] / full, incremental,
+                results[0][1] / incremental))
+
+        serial_dir = os.path.join(directory, "output0")
+        for io_threads in args.io_threads:
+            comparison = filecmp.dircmp(serial_dir, os.path.join(
+                directory, "output{}".format(io_threads)))
+            if comparison.left_only or comparison.right_only or comparison.diff_files:
+                print("--io-threads {} differs from the serial build".format(io_threads))
+                sys.exit(1)
+        print("Every build gives the same files")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,306 @@
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import textwrap
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.corpus import write_corpus
+from src.rd_reader import RDReader, MethodCategory
+from src.render_cache import render_cache
+from src.rst_builder import RSTBuilder
+from src.rst_table import grid_table
+
+# python benchmarks/bench_render.py --files 1000
+# python benchmarks/bench_render.py --man-dir ~/mxnet/R-package/man
+
+# Rd files whose blank, tab and unindented lines go through the corner
+# cases of textwrap.dedent
+EDGE_CASES = [
+    "\\name{{edge{0}}}\n\\alias{{edge{0}}}\n\\title{{Edge \t\n  \n case}}\n"
+    "\\usage{{\n \t \n}}\n"
+    "\\arguments{{\n\\item{{x}}{{ \n\tTabbed\n   \n}}\n}}\n"
+    "\\value{{\nout First\nunindented {0}\n  \t\n}}\n"
+    "\\description{{\nLine\n\t\n    indented\n}}\n"
+    "\\details{{\nExample::\n\n   f(x)\n \nDefined in src/op.cc:L{0}\n}}\n",
+    "\\name{{edge{0}}}\n\\alias{{edge{0}\n  }}\n\\title{{Edge}}\n"
+    "\\usage{{\nf(x)\n}}\n\\arguments{{\n\\item{{x}}{{1}}\n}}\n"
+    "\\value{{\nout\n}}\n\\description{{\n  \n}}\n"
+    "\\details{{\n\t\nDefined in src/op.cc:L{0}\n}}\n",
+    "\\name{{edge{0}}}\n\\alias{{edge{0}}}\n\\title{{Edge}}\n"
+    "\\usage{{\n\\method{{predict}}{{Model}}(model, X,\n  ctx = NULL)\n}}\n"
+    "\\value{{\n  out The result\n              indented like the template\n}}\n"
+    "\\description{{\nEdge\n}}\n",
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Check that RSTBuilder renders every page of a corpus like the '
+                    'LegacyRSTBuilder, and compare their render time per file.')
+    parser.add_argument('--files', type=int, default=1000,
+                        help='Number of Rd files of the generated corpus')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the corpus generator')
+    parser.add_argument('--man-dir', type=str,
+                        help='Use the Rd files of this directory instead of a generated corpus')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed runs, the fastest one is reported')
+    return parser.parse_args()
+
+class LegacyRSTBuilder:
+    '''
+    RSTBuilder as it was before RST_TEMPLATE, formatting the page into an
+    indented literal and dedenting it, kept as the reference output.
+    '''
+    def __init__(self, rd_reader, url=""):
+        self.url = url
+        self.rd_reader = rd_reader
+        self.rst_string = self.get_rst()
+
+    def dedent(func):
+        '''
+        Normalises all the printed string to fit the docstring indentation
+        so textwrap can remove all unnecessary indentations.
+        e.g.,
+        
+        """
+        text text 
+        {value}
+        """
+        if value contains \n, the indentation must match "text text"
+        
+        '''
+        def add_indentation_to_new_line(*args, **kwargs):
+            return func(*args, **kwargs).replace("\n", "\n        ")
+        return add_indentation_to_new_line
+            
+    @dedent
+    def get_default(self, key):
+        '''
+        The default method to get the string from  "name", "title", and "alias" string
+        categories
+        '''
+        return self.rd_reader.data[key].string
+
+    @dedent
+    def get_details(self):
+        '''
+        The method to get details category.
+        Several conditions are applied to the string and they commented.
+        If the Rd file does not contain "details", return nothing
+        '''
+        if "details" in self.rd_reader.data:
+            # Check if "defined in ..." is present, if so remove it (this will be used in
+            # get_link()).
+            details_string = self.rd_reader.data["details"].string
+            if "Defined in" in details_string:
+                details_string_without_definition = details_string.split("\n")[:-2]
+                details_string = "\n".join(details_string.split("\n")[:-2])
+            # Create emphasis on Example
+            details_string = details_string.replace("Example::", "**Example**::")
+            return details_string
+            
+        return ""
+
+    @dedent
+    def get_description(self):
+        '''
+        Method to get the description.
+        '''
+        description = self.rd_reader.data["description"].string
+        # Somtimes the description is identical to the title.
+        # If so, do not print the description
+        if description.replace("\n", "") == self.rd_reader.data["title"].string:
+            return ""
+        else:
+            return description
+
+    @dedent
+    def get_argument(self):
+        '''
+        Method to get the arguments. This generates a table that is in a markdown table
+        format with grid_table.
+        '''
+        if "arguments" in self.rd_reader.data:
+            headers = ["Argument", "Description"]
+            table = []
+            argument_items = self.rd_reader.data["arguments"].items
+
+            if len(argument_items) == 0:
+                return ""
+            
+            for argument in argument_items:
+                description = argument_items[argument]
+                table.append(["``{}``".format(argument), description])
+            return grid_table(table, headers)
+        else:
+            return ""
+
+    @dedent
+    def get_usage(self):
+        '''
+        Method to get the sample usages.
+        The usage can be of two types: string or methods.
+        '''
+        if "usage" in self.rd_reader.data:
+            category_class = self.rd_reader.data["usage"]
+            if isinstance(category_class, MethodCategory):
+                usage_value = category_class.get_value()
+            else:
+                usage_value = self.rd_reader.data["usage"].string
+
+            usage_value = usage_value.replace("\n", "") # To normalise the indentation
+            
+            usage_string = '''
+            Usage
+            ----------
+            .. code:: r
+            
+            \t{usage} 
+            '''.format(usage=usage_value)
+            return textwrap.dedent(usage_string)
+        else:
+            return ""
+
+    @dedent
+    def get_value(self):
+        '''
+        To get the value in the mark down file.
+        '''
+        if "value" in self.rd_reader.data:
+            # Put quotations around the first word in the value string
+            first_space = self.rd_reader.data["value"].string.find(" ")
+            first_word = self.rd_reader.data["value"].string[:first_space].replace("\n", "")
+            remaining_words = self.rd_reader.data["value"].string[first_space:]
+            value_string = '''
+            Value
+            ------------------
+            ``{first_word}`` {remaining_words}
+            '''.format(first_word=first_word, remaining_words=remaining_words)
+            return textwrap.dedent(value_string)
+        else:
+            return ""
+
+    @dedent
+    def get_link(self):
+        '''
+        Parse the last string in the "details" section and make make it into a link to
+        the mxnet source code.
+        '''
+        if "details" in self.rd_reader.data:
+            details_string = self.rd_reader.data["details"].string
+            defined_in_string = details_string.split("\n")[-2]
+            if "Defined in" in defined_in_string:
+                path = defined_in_string.split(" ")[-1]
+                path, line = path.split(":")
+                link_string = '''
+                Link to Source Code: {url}{path}#{line}
+                '''.format(url=self.url, path=path, line=line)
+                
+                return textwrap.dedent(link_string)
+        return ""
+
+    def get_rst(self):
+        '''
+        The main function of this class.
+        Function to build the RST from the Rd file.
+        '''
+        name = self.get_default("name")
+        title = self.get_default("title")
+        details = self.get_details()
+        description = self.get_description()
+        usage = self.get_usage()
+        arguments = self.get_argument()
+        value = self.get_value()
+        link = self.get_link()
+        alias = self.get_default("alias")
+        
+        rst_string = '''\
+        .. raw:: html
+
+
+        ``{name}``
+        ============================================
+        
+        Description
+        ----------------------
+
+        {title}
+        {description}
+        {details}
+        
+        {usage}
+
+        Arguments
+        ------------------
+
+        {arguments}
+
+        {value}
+
+        {link}
+        
+        .. disqus::
+                :disqus_identifier: {alias}
+
+        '''.format(name=name, title=title, description=description, details=details,
+                   usage=usage, arguments=arguments, value=value, link=link, alias=alias)
+
+        return textwrap.dedent(rst_string)
+
+
+def read_corpus(man_dir, edge_dir):
+    '''
+    Returns the RDReaders of the Rd files of man_dir and of the EDGE_CASES
+    written in edge_dir.
+    '''
+    filenames = sorted(glob.glob(os.path.join(man_dir, "*.Rd")))
+    for index, edge_case in enumerate(EDGE_CASES):
+        filename = os.path.join(edge_dir, "edge{}.Rd".format(index))
+        with open(filename, 'w') as f:
+            f.write(edge_case.format(index))
+        filenames.append(filename)
+    return [RDReader(filename) for filename in filenames]
+
+def run():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        man_dir = args.man_dir
+        if not man_dir:
+            man_dir, _ = write_corpus(directory, args.files, seed=args.seed)
+        rd_readers = read_corpus(man_dir, directory)
+
+    url = "http://github.com/apache/incubator-mxnet/blob/master/"
+    mismatches = [rd_reader.filename for rd_reader in rd_readers
+                  if RSTBuilder(rd_reader, url).rst_string !=
+                  LegacyRSTBuilder(rd_reader, url).rst_string]
+    print("{} pages, {} differ from LegacyRSTBuilder".format(len(rd_readers), len(mismatches)))
+    # Without --url the url is None, rendered as an empty one
+    no_url_mismatches = [rd_reader.filename + " (no url)" for rd_reader in rd_readers
+                         if RSTBuilder(rd_reader, None).rst_string !=
+                         LegacyRSTBuilder(rd_reader, "").rst_string]
+    print("{} pages without url, {} differ from LegacyRSTBuilder".format(
+        len(rd_readers), len(no_url_mismatches)))
+    mismatches += no_url_mismatches
+    for filename in mismatches[:10]:
+        print("  " + filename)
+
+    def render(builder):
+        # Every run renders with a cold cache, as a new process would
+        render_cache.clear()
+        for rd_reader in rd_readers:
+            builder(rd_reader, url)
+
+    print("{:>16} {:>12}".format("builder", "us per file"))
+    for builder in (LegacyRSTBuilder, RSTBuilder):
+        seconds = min(timeit.repeat(lambda: render(builder), number=1, repeat=args.repeat))
+        print("{:>16} {:>12.1f}".format(builder.__name__, seconds / len(rd_readers) * 1e6))
+
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    run()
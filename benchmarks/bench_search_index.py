@@ -0,0 +1,79 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.corpus import write_corpus
+from src.man_reader import ManReader
+from src.search_index import SEARCH_INDEX_FILENAME, search
+
+# python benchmarks/bench_search_index.py --files 1000 10000
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Measure the size and load time of the search index, and check '
+                    'that an incremental build gives the same index as a full one.')
+    parser.add_argument('--files', type=int, nargs='+', default=[1000, 10000],
+                        help='Number of Rd files of each generated corpus')
+    parser.add_argument('--changed', type=int, default=10,
+                        help='Number of Rd files changed before the incremental build')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of timed runs, the fastest one is reported')
+    return parser.parse_args()
+
+def change_files(man_dir, n_files):
+    '''
+    Changes the title of the first n_files Rd files.
+    '''
+    filenames = sorted(glob.glob(os.path.join(man_dir, "*.Rd")))
+    for filename in filenames[:n_files]:
+        with open(filename) as f:
+            content = f.read()
+        with open(filename, 'w') as f:
+            f.write(content.replace("\\title{", "\\title{Changed ", 1))
+
+def run():
+    args = parse_args()
+    print("{:>8} {:>10} {:>10} {:>12} {:>14}".format(
+        "files", "KB", "load ms", "search us", "incremental"))
+    failed = False
+    for n_files in args.files:
+        with tempfile.TemporaryDirectory() as directory:
+            man_dir, toctree_dir = write_corpus(directory, n_files)
+            incremental_dir = os.path.join(directory, "incremental")
+            full_dir = os.path.join(directory, "full")
+            os.mkdir(incremental_dir)
+            os.mkdir(full_dir)
+
+            ManReader(man_dir).write_rst(incremental_dir, toctree_dir, url="")
+            filename = os.path.join(incremental_dir, SEARCH_INDEX_FILENAME)
+            with open(filename) as f:
+                content = f.read()
+            load_seconds = min(timeit.repeat(lambda: json.loads(content), number=1,
+                                             repeat=args.repeat))
+            search_index = json.loads(content)
+            search_seconds = min(timeit.repeat(lambda: search(search_index, "nd op1 data"),
+                                               number=100, repeat=args.repeat)) / 100
+
+            change_files(man_dir, args.changed)
+            ManReader(man_dir).write_rst(incremental_dir, toctree_dir, url="")
+            ManReader(man_dir).write_rst(full_dir, toctree_dir, url="", force=True)
+            with open(os.path.join(incremental_dir, SEARCH_INDEX_FILENAME)) as f:
+                incremental = f.read()
+            with open(os.path.join(full_dir, SEARCH_INDEX_FILENAME)) as f:
+                full = f.read()
+            same = incremental == full
+            failed = failed or not same
+        print("{:>8} {:>10.1f} {:>10.2f} {:>12.1f} {:>14}".format(
+            n_files, len(content) / 1024, load_seconds * 1e3, search_seconds * 1e6,
+            "same" if same else "DIFFERS"))
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    run()
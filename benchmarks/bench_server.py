@@ -0,0 +1,64 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import write_corpus
+from Rd2SphinxRstClient import send
+
+# python benchmarks/bench_server.py --runs 20 --files 10
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Compare cold CLI invocations with requests to a warm server.')
+    parser.add_argument('--runs', type=int, default=20,
+                        help='Number of invocations of each kind')
+    parser.add_argument('--files', type=int, default=10,
+                        help='Number of Rd files of the package converted by each invocation')
+    return parser.parse_args()
+
+def time_runs(runs, func):
+    start = time.perf_counter()
+    for _ in range(runs):
+        func()
+    return (time.perf_counter() - start) / runs
+
+def run():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        man_dir, toctree_dir = write_corpus(directory, args.files)
+        output_dir = os.path.join(directory, "output")
+        os.mkdir(output_dir)
+        socket_path = os.path.join(directory, "server.sock")
+        build = [man_dir, toctree_dir, output_dir, "--url", "http://github.com/", "--force"]
+
+        cold = time_runs(args.runs, lambda: subprocess.run(
+            [sys.executable, os.path.join(ROOT, "Rd2SphinxRst.py")] + build, check=True))
+
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, "Rd2SphinxRstServer.py"),
+                                   "--socket", socket_path])
+        while not os.path.exists(socket_path):
+            time.sleep(0.05)
+        try:
+            warm_client = time_runs(args.runs, lambda: subprocess.run(
+                [sys.executable, os.path.join(ROOT, "Rd2SphinxRstClient.py"), socket_path,
+                 "build"] + build, check=True))
+            request = {"command": "build", "man_dir": man_dir, "toctree_dir": toctree_dir,
+                       "output_dir": output_dir, "url": "http://github.com/", "force": True}
+            warm_request = time_runs(args.runs, lambda: send(socket_path, request))
+        finally:
+            send(socket_path, {"command": "shutdown"})
+            server.wait()
+
+    print("{:<40} {:>10}".format("invocation", "ms"))
+    print("{:<40} {:>10.1f}".format("cold Rd2SphinxRst.py", cold * 1000))
+    print("{:<40} {:>10.1f}".format("Rd2SphinxRstClient.py to warm server", warm_client * 1000))
+    print("{:<40} {:>10.1f}".format("request to warm server", warm_request * 1000))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,115 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.corpus import write_corpus
+
+# python benchmarks/bench_startup.py
+# python benchmarks/bench_startup.py --max-import-ms 40 --max-first-file-ms 150
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# The runs write and use the bytecode of the modules, as an installed package
+# does, so that compiling the sources is not measured
+ENV = {name: value for name, value in os.environ.items()
+       if name != "PYTHONDONTWRITEBYTECODE"}
+
+# Modules a serial build of a directory must not import: they are only
+# needed by --jobs, --io-threads, --cache-dir, --cprofile, --watch, the
+# archives, the server or the tables left to tabulate
+LAZY_MODULES = ["concurrent.futures", "multiprocessing", "sqlite3", "tarfile", "zipfile",
+                "cProfile", "socket", "tabulate", "src.parse_cache", "src.watcher",
+                "src.server"]
+
+# Runs the CLI like python Rd2SphinxRst.py would, then prints the modules it
+# imported on the last line of stdout
+RUN_CLI = '''
+import runpy, sys
+before = set(sys.modules)
+sys.argv = ["Rd2SphinxRst.py"] + sys.argv[1:]
+runpy.run_path("Rd2SphinxRst.py", run_name="__main__")
+print(" ".join(sorted(set(sys.modules) - before)))
+'''
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Measure the import time of Rd2SphinxRst.py with python -X importtime '
+                    'and the time of a build of a single Rd file, and check that the '
+                    'serial build imports none of the lazily imported modules. Exits '
+                    'with 1 if a module is imported or a time is over its bound.')
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='Number of runs, the fastest one is reported')
+    parser.add_argument('--max-import-ms', type=float, default=60.0,
+                        help='Longest import time of Rd2SphinxRst.py and src, in ms')
+    parser.add_argument('--max-first-file-ms', type=float, default=200.0,
+                        help='Longest time of a build of one Rd file, on top of the '
+                             'startup of the interpreter, in ms')
+    return parser.parse_args()
+
+def get_import_us():
+    '''
+    Returns the cumulative import time of Rd2SphinxRst in microseconds, as
+    reported by python -X importtime.
+    '''
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import Rd2SphinxRst"],
+                            cwd=ROOT, env=ENV, capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == "Rd2SphinxRst":
+            return int(fields[1])
+    raise RuntimeError("Rd2SphinxRst not found in:\n" + result.stderr)
+
+def time_run(command):
+    '''
+    Returns the wall time of a command in seconds and its stdout.
+    '''
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=ROOT, env=ENV, capture_output=True, text=True,
+                            check=True)
+    return time.perf_counter() - start, result.stdout
+
+def run():
+    args = parse_args()
+    failures = []
+    import_ms = min(get_import_us() for _ in range(args.repeat)) / 1000
+
+    with tempfile.TemporaryDirectory() as directory:
+        man_dir, toctree_dir = write_corpus(directory, 1)
+        output_dir = os.path.join(directory, "output")
+        os.mkdir(output_dir)
+        command = [sys.executable, "-c", RUN_CLI, man_dir, toctree_dir, output_dir,
+                   "--url", "http://github.com/", "--force"]
+        first_file, imported = min(time_run(command) for _ in range(args.repeat))
+        interpreter = min(time_run([sys.executable, "-c", "pass"])[0]
+                          for _ in range(args.repeat))
+    first_file_ms = (first_file - interpreter) * 1000
+    imported = set(imported.split("\n")[-2].split())
+
+    print("{:<44} {:>10.1f}".format("import Rd2SphinxRst ms (python -X importtime)",
+                                    import_ms))
+    print("{:<44} {:>10.1f}".format("interpreter startup ms", interpreter * 1000))
+    print("{:<44} {:>10.1f}".format("build of one Rd file ms, without startup",
+                                    first_file_ms))
+    print("{:<44} {:>10}".format("modules imported by the build", len(imported)))
+    if import_ms > args.max_import_ms:
+        failures.append("import took {:.1f} ms, more than {} ms".format(
+            import_ms, args.max_import_ms))
+    if first_file_ms > args.max_first_file_ms:
+        failures.append("build of one file took {:.1f} ms, more than {} ms".format(
+            first_file_ms, args.max_first_file_ms))
+    for module in LAZY_MODULES:
+        if module in imported:
+            failures.append("{} is imported by a serial build".format(module))
+
+    for failure in failures:
+        print("FAILED " + failure)
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    run()
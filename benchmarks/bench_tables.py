@@ -0,0 +1,120 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from tabulate import tabulate
+
+from benchmarks.corpus import write_corpus
+from src.function_index import FunctionIndex
+from src.rd_reader import RDReader
+from src.rst_table import grid_table, rst_table
+
+# python benchmarks/bench_tables.py --files 1000
+# python benchmarks/bench_tables.py --man-dir ~/mxnet/R-package/man --toctree-dir ~/toctree
+
+HEADERS = ["Argument", "Description"]
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Check that grid_table and rst_table give the same tables as '
+                    'tabulate on a corpus, and compare their speed.')
+    parser.add_argument('--files', type=int, default=1000,
+                        help='Number of Rd files of the generated corpus')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the corpus generator')
+    parser.add_argument('--man-dir', type=str,
+                        help='Use the Rd files of this directory instead of a generated corpus')
+    parser.add_argument('--toctree-dir', type=str,
+                        help='Toctree JSON files going with --man-dir')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed runs, the fastest one is reported')
+    return parser.parse_args()
+
+def get_tables(man_dir, toctree_dir):
+    '''
+    Returns the rows of the argument tables of the Rd files and of the API
+    tables of the toctree files, as given to tabulate by RSTBuilder and
+    TocTreeReader.
+    '''
+    index = FunctionIndex()
+    argument_tables = []
+    for filename in sorted(glob.glob(os.path.join(man_dir, "*.Rd"))):
+        rd_reader = RDReader(filename)
+        index.add(rd_reader.get_summary())
+        if "arguments" in rd_reader.data:
+            items = rd_reader.data["arguments"].items
+            if items:
+                argument_tables.append([["``{}``".format(argument), description]
+                                        for argument, description in items.items()])
+
+    api_tables = []
+    for filename in sorted(glob.glob(os.path.join(toctree_dir or "", "*.json"))):
+        with open(filename, 'r') as f:
+            sections = json.load(f)["sections"]
+        while sections:
+            section = sections.pop()
+            sections.extend(section.get("subsection", []))
+            if section.get("print_api"):
+                api_tables.append([
+                    [":doc: `{function} <./{function}>`".format(function=function),
+                     index.get_title(function) if function in index else None]
+                    for function in section["functions"]])
+    return argument_tables, api_tables
+
+def check(argument_tables, api_tables):
+    '''
+    Returns the number of tables that differ from the output of tabulate.
+    '''
+    mismatches = 0
+    for table in argument_tables:
+        if grid_table(table, HEADERS) != tabulate(table, HEADERS, tablefmt="grid"):
+            mismatches += 1
+    for table in api_tables:
+        if rst_table(table) != tabulate(table, tablefmt="rst"):
+            mismatches += 1
+    return mismatches
+
+def run():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        if args.man_dir:
+            man_dir, toctree_dir = args.man_dir, args.toctree_dir
+        else:
+            man_dir, toctree_dir = write_corpus(directory, args.files, seed=args.seed)
+        argument_tables, api_tables = get_tables(man_dir, toctree_dir)
+
+    mismatches = check(argument_tables, api_tables)
+    print("{} argument tables, {} API tables, {} differ from tabulate".format(
+        len(argument_tables), len(api_tables), mismatches))
+
+    benchmarks = [
+        ("grid", argument_tables,
+         lambda table: tabulate(table, HEADERS, tablefmt="grid"),
+         lambda table: grid_table(table, HEADERS)),
+        ("rst", api_tables,
+         lambda table: tabulate(table, tablefmt="rst"),
+         rst_table)]
+    print("{:>6} {:>8} {:>14} {:>14} {:>9}".format(
+        "format", "tables", "tabulate us", "native us", "speedup"))
+    for tablefmt, tables, tabulate_func, native_func in benchmarks:
+        if not tables:
+            continue
+        seconds = []
+        for func in (tabulate_func, native_func):
+            seconds.append(min(timeit.repeat(lambda: [func(table) for table in tables],
+                                             number=1, repeat=args.repeat)))
+        print("{:>6} {:>8} {:>14.1f} {:>14.1f} {:>8.1f}x".format(
+            tablefmt, len(tables), seconds[0] / len(tables) * 1e6,
+            seconds[1] / len(tables) * 1e6, seconds[0] / seconds[1]))
+
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    run()
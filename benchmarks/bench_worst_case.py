@@ -0,0 +1,143 @@
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.corpus import write_corpus
+from src.limits import Limits
+from src.man_reader import ManReader
+from src.rd_reader import RDReader
+from src.rst_builder import RSTBuilder
+
+# python benchmarks/bench_worst_case.py
+# python benchmarks/bench_worst_case.py --scales 10000 40000 160000 640000 --max-seconds 10
+
+HEADER = "\\name{f}\n\\alias{f}\n\\title{Title}\n\\description{\nDescription\n}\n"
+
+# Pathological Rd files, each built from a size n
+CASES = {
+    "unbalanced open braces":
+        lambda n: HEADER + "\\details{\n" + "{" * n + "x\n}\n",
+    "unbalanced close braces":
+        lambda n: HEADER + "\\details{\nx\n}\n" + "}" * n,
+    "deep nesting":
+        lambda n: HEADER + "\\details{\n" + "\\code{" * n + "x" + "}" * n + "\n}\n",
+    "long single line":
+        lambda n: HEADER + "\\details{\n" + "word " * n + "\n}\n",
+    "many items":
+        lambda n: HEADER + "\\arguments{\n" + "".join(
+            "\\item{{arg_{0}}}{{Argument {0}}}\n".format(i) for i in range(n // 4)) + "}\n",
+    "many methods":
+        lambda n: HEADER + "\\usage{\n" + "".join(
+            "\\method{{print}}{{model_{0}}}(x)\n".format(i) for i in range(n // 4)) + "}\n",
+    "unclosed items":
+        lambda n: HEADER + "\\arguments{\n" + "\\item{a}{" * (n // 2) + "\n}\n",
+    "escaped braces and backslashes":
+        lambda n: HEADER + "\\details{\n" + "\\{\\}\\\\" * (n // 2) + "\n}\n",
+    "comments":
+        lambda n: HEADER + "\\details{\n" + "% {\n" * n + "x}\n",
+    "top level macros without braces":
+        lambda n: "\\x" * n + "\n" + HEADER,
+    "megabyte value":
+        lambda n: HEADER + "\\value{\nNDArray " + "v " * n + "\n" + "\n    x" * (n // 10) + "\n}\n",
+    "megabyte usage":
+        lambda n: HEADER + "\\usage{\n" + "f(x)\n" * n + "}\n",
+}
+
+# Malformed files that cannot be converted, reported and skipped by the build
+MALFORMED = {
+    "unclosed_description.Rd": "\\name{g}\n\\alias{g}\n\\title{G}\n\\description{\nG\n",
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Check that RDReader and RSTBuilder stay linear and fast on '
+                    'pathological Rd files, and that the build skips the files over '
+                    'the limits instead of failing or hanging. Exits with 1 otherwise.')
+    parser.add_argument('--scales', type=int, nargs='+', default=[10000, 40000, 160000],
+                        help='Sizes of each pathological file, in repetitions of its pattern')
+    parser.add_argument('--max-seconds', type=float, default=5.0,
+                        help='Longest time allowed to parse and render one file')
+    parser.add_argument('--max-growth', type=float, default=3.0,
+                        help='Largest growth of the time per KB from the smallest '
+                             'to the largest scale, 1 is perfectly linear')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed runs, the fastest one is reported')
+    return parser.parse_args()
+
+def convert(content):
+    return RSTBuilder(RDReader.from_text(content, "f.Rd"), "http://github.com/").rst_string
+
+def check_scaling(args):
+    '''
+    Times every case at every scale and returns the failed checks.
+    '''
+    failures = []
+    print("{:<34} {:>10} {:>10} {:>10} {:>8}".format(
+        "case", "KB", "seconds", "us per KB", "growth"))
+    for name, make_content in CASES.items():
+        us_per_kb = []
+        for scale in args.scales:
+            content = make_content(scale)
+            seconds = min(timeit.repeat(lambda: convert(content), number=1,
+                                        repeat=args.repeat))
+            kb = len(content) / 1024
+            us_per_kb.append(seconds / kb * 1e6)
+            growth = us_per_kb[-1] / us_per_kb[0]
+            print("{:<34} {:>10.1f} {:>10.4f} {:>10.2f} {:>7.2f}x".format(
+                name, kb, seconds, us_per_kb[-1], growth))
+            if seconds > args.max_seconds:
+                failures.append("{} at {:.0f} KB: {:.2f} seconds".format(name, kb, seconds))
+        if growth > args.max_growth:
+            failures.append("{}: time per KB grew {:.2f}x".format(name, growth))
+    return failures
+
+def check_guards():
+    '''
+    Builds a small corpus with an oversized, a slow and a malformed file, and
+    returns the failed checks: the build must complete, skip these three
+    files and convert all the others.
+    '''
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        man_dir, toctree_dir = write_corpus(directory, 20)
+        expected = set()
+        for filename, content in MALFORMED.items():
+            with open(os.path.join(man_dir, filename), 'w') as f:
+                f.write(content)
+            expected.add(filename)
+        with open(os.path.join(man_dir, "oversized.Rd"), 'w') as f:
+            f.write(CASES["long single line"](1000000))
+        expected.add("oversized.Rd")
+        with open(os.path.join(man_dir, "slow.Rd"), 'w') as f:
+            f.write(CASES["many items"](400000))
+        expected.add("slow.Rd")
+
+        output_dir = os.path.join(directory, "output")
+        os.mkdir(output_dir)
+        mr = ManReader(man_dir, limits=Limits(max_size=4 * 1024 * 1024, max_seconds=0.05))
+        mr.write_rst(output_dir, toctree_dir, url="")
+        skipped = {os.path.basename(filename): error for filename, error in mr.skipped.items()}
+        for filename, error in sorted(skipped.items()):
+            print("Skipped {}: {}".format(filename, error))
+        if set(skipped) != expected:
+            failures.append("Skipped {} instead of {}".format(sorted(skipped), sorted(expected)))
+        converted = [filename for filename in os.listdir(output_dir) if filename.endswith(".rst")]
+        if len(converted) < 20:
+            failures.append("Only {} RST files were written".format(len(converted)))
+    return failures
+
+def run():
+    args = parse_args()
+    failures = check_scaling(args) + check_guards()
+    for failure in failures:
+        print("FAILED " + failure)
+    if failures:
+        sys.exit(1)
+    print("Every case is linear and under {} seconds".format(args.max_seconds))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,146 @@
+import argparse
+import json
+import os
+import random
+
+# python benchmarks/corpus.py ~/Desktop/corpus --files 1000
+
+ARGUMENT_DESCRIPTIONS = [
+    "NDArray-or-Symbol\nThe input array.",
+    "int, optional, default='1'\nThe axis {along} which to \\code{compute}.",
+    "Shape(tuple), required\nShape of the output, e.g. \\code{c(1, 2)}.\n"
+    "Second line of a long description that goes on for a while and a while.",
+    "boolean, optional\nWhether to use \\code{\\link{mx.nd.sum}} or a \\emph{{nested {brace}}}.",
+    "string, optional, default='None'\nName of the resulting symbol.",
+]
+
+DETAILS = '''Example::
+
+   {name}([-2, 0, 3]) = [2, 0, 3]
+
+The storage type of ``{name}`` output depends upon the input storage type:
+
+   - {name}(default) = default
+   - {name}(row_sparse) = row_sparse
+'''
+
+def make_rd(index, rnd, max_arguments=12, examples_lines=40):
+    '''
+    Returns the name and the content of a Roxygen2 style Rd file.
+    The number of arguments, the \\method usage, the nested braces, the braces
+    in strings, the length of the examples and the "Defined in" details vary
+    from file to file.
+    '''
+    name = "mx.nd.op{}".format(index)
+    lines = ["% Generated by roxygen2: do not edit by hand",
+             "% Please edit documentation in R/mxnet_generated.R",
+             "\\name{{{}}}".format(name),
+             "\\alias{{{}}}".format(name)]
+    if rnd.random() < 0.2:
+        lines.append("\\title{{Returns element-wise value of\n\\code{{{}}} for the input.}}"
+                     .format(name))
+    else:
+        lines.append("\\title{{Returns element-wise value of {} for the input.}}".format(name))
+
+    n_arguments = rnd.randint(1, max_arguments)
+    if rnd.random() < 0.15:
+        lines.append("\\usage{{\n\\method{{predict}}{{MXFeedForwardModel{}}}(model, X, "
+                     "ctx = NULL,\n  array.batch.size = 128, array.layout = \"auto\")\n}}"
+                     .format(index))
+    else:
+        usage_arguments = ["arg{} = NULL".format(i) for i in range(1, n_arguments)]
+        # Braces in the strings of the usage, which are not counted
+        if index % 10 == 3:
+            usage_arguments.append('.open = "{"')
+        elif index % 10 == 7:
+            usage_arguments.append('.close = "}"')
+        lines.append("\\usage{{\n{}({})\n}}".format(name, ", ".join(usage_arguments)))
+
+    items = ["\\item{data}{NDArray-or-Symbol\nThe input array.}"]
+    if index % 10 == 3:
+        items.append('\\item{.open}{The opening delimiter, \\code{"{"}.}')
+    for i in range(1, n_arguments):
+        items.append("\\item{{arg{}}}{{{}}}".format(i, rnd.choice(ARGUMENT_DESCRIPTIONS)))
+    lines.append("\\arguments{\n" + "\n\n".join(items) + "\n}")
+
+    lines.append("\\value{\nout The result mx.ndarray\n}")
+    if rnd.random() < 0.5:
+        lines.append("\\description{{\nReturns element-wise value of {} for the input.\n}}"
+                     .format(name))
+    else:
+        lines.append("\\description{{\nA longer description of {}.\nWith two lines "
+                     "and \\code{{x}}.\n}}".format(name))
+
+    details = DETAILS.format(name=name)
+    if rnd.random() < 0.8:
+        details += "\nDefined in src/operator/tensor/elemwise_unary_op_basic.cc:L{}".format(index)
+    lines.append("\\details{\n" + details + "\n}")
+
+    examples = ["x <- mx.nd.array(c({}, 2))".format(i)
+                for i in range(rnd.randint(1, examples_lines))]
+    examples.append("if (TRUE) {\n  y <- x\n}")
+    lines.append("\\examples{\n" + "\n".join(examples) + "\n}")
+    return name, "\n".join(lines) + "\n"
+
+def make_toctree(title, identifier, names):
+    '''
+    Returns a toctree JSON configuration listing the given functions.
+    '''
+    half = len(names) // 2
+    return {
+        "title": title, "identifier": identifier,
+        "sections": [
+            {"title": "Functions", "type": "General", "print_api": True,
+             "functions": names[:half], "toctree_properties": ":maxdepth: 1\n:hidden:"},
+            {"title": "More functions", "type": "General-sub", "subsection": [
+                {"title": "Printed", "type": "General", "print_api": True,
+                 "functions": names[half:], "toctree_properties": ":maxdepth: 1"},
+                {"title": "", "type": "General", "print_api": False,
+                 "functions": names[half:], "toctree_properties": ":hidden:"}]},
+            {"title": "Tutorials", "type": "Tutorial", "print_api": False,
+             "functions": [{"name": "Introduction", "filename": "intro"}],
+             "toctree_properties": ":maxdepth: 2"}]}
+
+def write_corpus(directory, n_files, seed=0, max_arguments=12, examples_lines=40,
+                 functions_per_toctree=100):
+    '''
+    Writes n_files Rd files in directory/man and matching toctree JSON files in
+    directory/toctree. The same seed always gives the same corpus.
+
+    Returns the paths of the man and toctree directories.
+    '''
+    rnd = random.Random(seed)
+    man_dir = os.path.join(directory, "man")
+    toctree_dir = os.path.join(directory, "toctree")
+    os.makedirs(man_dir, exist_ok=True)
+    os.makedirs(toctree_dir, exist_ok=True)
+
+    names = []
+    for index in range(n_files):
+        name, content = make_rd(index, rnd, max_arguments, examples_lines)
+        names.append(name)
+        with open(os.path.join(man_dir, name + ".Rd"), 'w') as f:
+            f.write(content)
+
+    for start in range(0, n_files, functions_per_toctree):
+        identifier = "api{}".format(start // functions_per_toctree)
+        toctree = make_toctree("API {}".format(identifier), identifier,
+                               names[start:start + functions_per_toctree])
+        with open(os.path.join(toctree_dir, identifier + ".json"), 'w') as f:
+            json.dump(toctree, f)
+    return man_dir, toctree_dir
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Generate a synthetic corpus of Rd files and toctree JSON files.')
+    parser.add_argument('output_dir', type=str,
+                        help='Directory to put the man and toctree directories')
+    parser.add_argument('--files', type=int, default=1000,
+                        help='Number of Rd files')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the generator')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    write_corpus(args.output_dir, args.files, seed=args.seed)
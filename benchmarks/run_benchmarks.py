@@ -0,0 +1,242 @@
+import argparse
+import gc
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.corpus import write_corpus
+from src.file_writer import write_file
+from src.function_index import FunctionIndex
+from src.rd_reader import RDReader
+from src.render_cache import render_cache
+from src.rst_builder import RSTBuilder, get_output_filename
+from src.toctree_reader import TocTreeReader
+
+# python benchmarks/run_benchmarks.py --files 1000 5000 10000
+# python benchmarks/run_benchmarks.py --files 1000 5000 --save-baseline
+
+STAGES = ["read", "parse", "render", "toctree", "write"]
+# Stages compared with the baseline, read and write depend on the file system
+# more than on the converter
+CHECKED_STAGES = ["parse", "render", "toctree"]
+# Stages shorter than this are not compared, their time is mostly noise
+MIN_CHECKED_SECONDS = 0.1
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Measure the throughput of each stage of the conversion.')
+    parser.add_argument('--files', type=int, nargs='+', default=[1000, 5000],
+                        help='Number of Rd files of each generated corpus')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the corpus generator')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of timed runs, the median of each stage is kept')
+    parser.add_argument('--baseline', type=str, default=DEFAULT_BASELINE,
+                        help='Baseline JSON file to compare against')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Save the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Slowdown relative to the baseline reported as a regression')
+    return parser.parse_args()
+
+def reference_workload():
+    '''
+    Fixed string and dict work, independent of the converter, timed right
+    before each stage. The stages are compared with the baseline relative to
+    its time, so that the baseline does not depend on the speed of the
+    machine, nor on its speed at the time of the stage.
+    '''
+    counts = {}
+    for i in range(50000):
+        word = "word{}".format(i % 1000)
+        counts[word] = counts.get(word, 0) + len(word.split("o"))
+    return counts
+
+def time_reference():
+    start = time.perf_counter()
+    reference_workload()
+    return time.perf_counter() - start
+
+def stage_result(seconds, n_files, n_bytes, reference):
+    return {"seconds": seconds, "files_per_second": n_files / seconds,
+            "mb_per_second": n_bytes / seconds / 1024 / 1024,
+            "relative": seconds / reference}
+
+def benchmark(man_dir, toctree_dir, output_dir):
+    '''
+    Times each stage of the conversion of the corpus into an empty output_dir.
+    Returns {stage: {"seconds": ..., "files_per_second": ..., "mb_per_second": ...,
+    "relative": ...}}, "relative" being the time of the stage divided by the
+    time of the reference workload.
+    '''
+    filenames = sorted(glob.glob(os.path.join(man_dir, "*.Rd")))
+    n_files = len(filenames)
+    toctree_files = sorted(glob.glob(os.path.join(toctree_dir, "*.json")))
+    results = {}
+
+    reference = time_reference()
+    start = time.perf_counter()
+    contents = []
+    for filename in filenames:
+        with open(filename, 'r') as rd_file:
+            contents.append(rd_file.read())
+    input_bytes = sum(len(content) for content in contents)
+    results["read"] = stage_result(time.perf_counter() - start, n_files, input_bytes,
+                                   reference)
+
+    reference = time_reference()
+    start = time.perf_counter()
+    rd_readers = []
+    for filename, content in zip(filenames, contents):
+        rd_reader = RDReader.__new__(RDReader)
+        rd_reader.filename = filename
+        rd_reader.data = rd_reader.parse_file(content)
+        rd_readers.append(rd_reader)
+    results["parse"] = stage_result(time.perf_counter() - start, n_files, input_bytes,
+                                    reference)
+
+    # Every run renders with a cold cache, as a new process would
+    render_cache.clear()
+    reference = time_reference()
+    start = time.perf_counter()
+    rst_strings = [RSTBuilder(rd_reader, "http://github.com/").rst_string
+                   for rd_reader in rd_readers]
+    output_bytes = sum(len(rst_string) for rst_string in rst_strings)
+    results["render"] = stage_result(time.perf_counter() - start, n_files, output_bytes,
+                                     reference)
+
+    index = FunctionIndex(rd_reader.get_summary() for rd_reader in rd_readers)
+    reference = time_reference()
+    start = time.perf_counter()
+    for toctree_file in toctree_files:
+        TocTreeReader(toctree_file, index=index).write_rst_file(output_dir)
+    toctree_bytes = sum(os.path.getsize(f) for f in toctree_files)
+    results["toctree"] = stage_result(time.perf_counter() - start, len(toctree_files),
+                                      toctree_bytes, reference)
+
+    reference = time_reference()
+    start = time.perf_counter()
+    for filename, rst_string in zip(filenames, rst_strings):
+        write_file(os.path.join(output_dir, get_output_filename(filename)), rst_string)
+    results["write"] = stage_result(time.perf_counter() - start, n_files, output_bytes,
+                                    reference)
+    return results
+
+def median_results(runs):
+    '''
+    Returns the median result of each stage of the runs, and the median of
+    their relative times.
+    '''
+    results = {}
+    for stage in STAGES:
+        stage_runs = sorted((stage_results[stage] for stage_results in runs),
+                            key=lambda result: result["seconds"])
+        result = dict(stage_runs[len(stage_runs) // 2])
+        result["relative"] = statistics.median(result["relative"] for result in stage_runs)
+        results[stage] = result
+    return results
+
+def compare(results, baseline, threshold):
+    '''
+    Prints the results next to the baseline and returns the list of
+    regressions, i.e. the CHECKED_STAGES lasting at least MIN_CHECKED_SECONDS
+    whose time relative to the reference workload is over the one of the
+    baseline by more than threshold.
+    '''
+    regressions = []
+    print("{:>8} {:>8} {:>12} {:>10} {:>10} {:>10} {:>8}".format(
+        "files", "stage", "files/s", "MB/s", "relative", "baseline", "change"))
+    for n_files, stages in results.items():
+        for stage in STAGES:
+            result = stages[stage]
+            previous = baseline.get(n_files, {}).get(stage)
+            if previous:
+                change = result["relative"] / previous["relative"] - 1
+                flag = ""
+                if stage not in CHECKED_STAGES or result["seconds"] < MIN_CHECKED_SECONDS:
+                    flag = " (not checked)"
+                elif change > threshold:
+                    flag = " REGRESSION"
+                    regressions.append((n_files, stage, change))
+                comparison = "{:>10.4f} {:>+7.1%}{}".format(previous["relative"], change, flag)
+            else:
+                comparison = "{:>10} {:>8}".format("-", "-")
+            print("{:>8} {:>8} {:>12.1f} {:>10.2f} {:>10.4f} {}".format(
+                n_files, stage, result["files_per_second"], result["mb_per_second"],
+                result["relative"], comparison))
+    return regressions
+
+def get_parameters(args):
+    '''
+    Returns the parameters of the generated corpora, the results of runs on
+    other corpora cannot be compared.
+    '''
+    return {"seed": args.seed}
+
+def load_baseline(args):
+    '''
+    Returns the baseline results, {n_files: {stage: result}}. Exits if the
+    baseline is missing or was recorded with other parameters, unless it is
+    being saved.
+    '''
+    if not os.path.exists(args.baseline):
+        if args.save_baseline:
+            return {}
+        sys.exit("No baseline {}, record one with --save-baseline".format(args.baseline))
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["parameters"] != get_parameters(args):
+        if args.save_baseline:
+            return {}
+        sys.exit("The baseline {} was recorded with {}, not {}".format(
+            args.baseline, baseline["parameters"], get_parameters(args)))
+    print("Baseline recorded on {}".format(baseline["machine"]))
+    missing = [str(n_files) for n_files in args.files
+               if str(n_files) not in baseline["results"]]
+    if missing:
+        print("No baseline for {} files, record one with --save-baseline".format(
+            ", ".join(missing)), file=sys.stderr)
+    return baseline["results"]
+
+def run():
+    args = parse_args()
+    baseline = load_baseline(args)
+    results = {}
+    for n_files in args.files:
+        with tempfile.TemporaryDirectory() as directory:
+            man_dir, toctree_dir = write_corpus(directory, n_files, args.seed)
+            runs = []
+            for repeat in range(args.repeat):
+                output_dir = os.path.join(directory, "output{}".format(repeat))
+                os.mkdir(output_dir)
+                # Collections are triggered by the previous runs, not by the stages
+                gc.collect()
+                gc.disable()
+                try:
+                    runs.append(benchmark(man_dir, toctree_dir, output_dir))
+                finally:
+                    gc.enable()
+            results[str(n_files)] = median_results(runs)
+
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({"parameters": get_parameters(args), "machine": platform.platform(),
+                       "results": baseline}, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    run()
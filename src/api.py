@@ -0,0 +1,25 @@
+from src.rd_reader import RDReader
+from src.renderers import RENDERERS
+
+def convert(rd_text, url="", output_format="rst"):
+    '''
+    Returns the RST page of an Rd file from its content, without reading or
+    writing any file, or its page in another output_format of RENDERERS,
+    e.g., "md" or "json".
+
+    Usage:
+        with open("man/mx.nd.abs.Rd") as f:
+            rst = convert(f.read(), url="http://github.com/apache/incubator-mxnet/blob/master/")
+
+    Parameter:
+    ----------
+    rd_text: (str)
+        Content of the Rd file
+
+    url: (str)
+        URL of the repository, used by the links to the source code
+
+    output_format: (str)
+        Format of the page, "rst", "md" or "json"
+    '''
+    return RENDERERS[output_format].render(RDReader.from_text(rd_text), url)
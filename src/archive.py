@@ -0,0 +1,233 @@
+import glob
+import io
+import locale
+import os
+import sys
+import tempfile
+
+from src.file_writer import FILE_MODE, write_file
+
+# Extensions of the archives and the format of each one
+ARCHIVE_EXTENSIONS = [(".tar", "tar"), (".tar.gz", "tar.gz"), (".tgz", "tar.gz"),
+                      (".tar.bz2", "tar.bz2"), (".tbz2", "tar.bz2"),
+                      (".tar.xz", "tar.xz"), (".txz", "tar.xz"), (".zip", "zip")]
+ARCHIVE_FORMATS = ["tar", "tar.gz", "tar.bz2", "tar.xz", "zip"]
+
+# tarfile and zipfile are only imported when an archive is read or written,
+# so that the builds of directories do not pay for them at startup
+
+# Date of the files written in the archives, so that the same RST files
+# always give the same archive
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+class ArchiveError(Exception):
+    '''
+    Raised when an archive cannot be read as a directory of Rd files, e.g., it
+    holds two Rd files with the same name.
+    '''
+
+def get_archive_format(path):
+    '''
+    Returns the format of the archive from its extension, None if path is
+    not an archive. "-", i.e. stdin or stdout, is a tar stream.
+    '''
+    if path == "-":
+        return "tar"
+    for extension, archive_format in ARCHIVE_EXTENSIONS:
+        if path.lower().endswith(extension):
+            return archive_format
+    return None
+
+def is_archive(path):
+    return get_archive_format(path) is not None
+
+def decode(data):
+    '''
+    Returns the content of a file read in binary decoded as open(filename, 'r')
+    does, so that an archive gives the same RST files as a directory.
+    '''
+    with io.TextIOWrapper(io.BytesIO(data)) as text_file:
+        return text_file.read()
+
+def is_man_entry(name):
+    '''
+    Returns True if the archive entry name is an Rd file of the top-level man
+    directory, i.e. "mx.nd.abs.Rd", "man/mx.nd.abs.Rd" or
+    "mxnet/man/mx.nd.abs.Rd", like the files a directory build reads. The Rd
+    files of its subdirectories, e.g. man/macros/ or man/unix/, are left out.
+    '''
+    parts = [part for part in name.split("/") if part not in ("", ".")]
+    if not parts or not parts[-1].endswith(".Rd"):
+        return False
+    directories = parts[:-1]
+    return not directories or (directories[-1] == "man" and len(directories) <= 2)
+
+def check_duplicate(name, basenames):
+    '''
+    Raises an ArchiveError if an Rd file with the basename of name was already
+    read, the two files would give the same function and RST file.
+    '''
+    basename = os.path.basename(name)
+    if basename in basenames:
+        raise ArchiveError("Two Rd files named {} in the archive: {}".format(
+            basename, name))
+    basenames.add(basename)
+
+def iter_rd_files(path):
+    '''
+    Generator yielding the (filename, content) of every Rd file of a
+    directory, of a tar or zip archive, or of a tar stream read from stdin
+    if path is "-". The content is the bytes of the file, to be decoded with
+    decode(). The files of an archive are read in the order of the archive,
+    one at a time, without extracting them. Only the Rd files of the top-level
+    man directory of an archive are read, see is_man_entry, and an
+    ArchiveError is raised if two of them have the same name.
+    '''
+    basenames = set()
+    if os.path.isdir(path):
+        for filename in sorted(glob.glob(os.path.join(path, "*.Rd"))):
+            with open(filename, 'rb') as rd_file:
+                yield filename, rd_file.read()
+    elif get_archive_format(path) == "zip":
+        import zipfile
+        with zipfile.ZipFile(path) as zip_file:
+            for info in zip_file.infolist():
+                if not info.is_dir() and is_man_entry(info.filename):
+                    check_duplicate(info.filename, basenames)
+                    yield info.filename, zip_file.read(info)
+    else:
+        # A stream, read member after member, works for stdin and for files
+        import tarfile
+        if path == "-":
+            tar_file = tarfile.open(fileobj=sys.stdin.buffer, mode="r|*")
+        else:
+            tar_file = tarfile.open(path, mode="r|*")
+        with tar_file:
+            for member in tar_file:
+                if member.isfile() and is_man_entry(member.name):
+                    check_duplicate(member.name, basenames)
+                    yield member.name, tar_file.extractfile(member).read()
+
+class ArchiveWriter:
+    '''
+    ArchiveWriter streams text files into a tar or zip archive saved to a
+    file, or written to stdout if path is "-". Each file is added to the
+    archive as soon as it is written, so only one file is in memory at a
+    time. The archive is written to a temporary file renamed to path once
+    it is closed, and removed if the with block raises, e.g., a
+    MissingFunctionError, so that a failed build leaves no truncated archive.
+
+    Usage:
+        with ArchiveWriter("doc.tar.gz") as writer:
+            writer.write("mx.nd.abs.rst", rst_string)
+
+    Parameter:
+    ----------
+    path: (str)
+        Path of the archive, "-" for stdout
+
+    archive_format: (str)
+        One of ARCHIVE_FORMATS, by default the format of the extension of path
+        and "tar" for stdout
+    '''
+    def __init__(self, path, archive_format=None):
+        self.archive_format = archive_format or get_archive_format(path) or "tar"
+        if self.archive_format not in ARCHIVE_FORMATS:
+            raise ValueError("Unknown archive format: {}".format(self.archive_format))
+        self.path = path
+        self.to_stdout = path == "-"
+        if self.to_stdout:
+            self.file = sys.stdout.buffer
+        else:
+            directory, basename = os.path.split(path)
+            fd, self.temp_path = tempfile.mkstemp(prefix="." + basename + ".", suffix=".tmp",
+                                                  dir=directory or ".")
+            self.file = os.fdopen(fd, 'wb')
+        # Encoded as open(filename, 'w') does
+        self.encoding = locale.getpreferredencoding(False)
+        if self.archive_format == "zip":
+            import zipfile
+            self.archive = zipfile.ZipFile(self.file, 'w', zipfile.ZIP_DEFLATED)
+        else:
+            import tarfile
+            compression = self.archive_format[len("tar."):]
+            self.archive = tarfile.open(fileobj=self.file, mode="w|" + compression)
+
+    def write(self, filename, content):
+        data = content.encode(self.encoding)
+        if self.archive_format == "zip":
+            import zipfile
+            info = zipfile.ZipInfo(filename, date_time=ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            self.archive.writestr(info, data)
+        else:
+            import tarfile
+            info = tarfile.TarInfo(filename)
+            info.size = len(data)
+            info.mode = 0o644
+            self.archive.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self.archive.close()
+        if self.to_stdout:
+            self.file.flush()
+        else:
+            self.file.close()
+            os.chmod(self.temp_path, FILE_MODE)
+            os.replace(self.temp_path, self.path)
+
+    def discard(self):
+        '''
+        Closes the archive without saving it. What was already written to
+        stdout cannot be taken back, it is only flushed.
+        '''
+        if self.to_stdout:
+            self.close()
+            return
+        try:
+            self.archive.close()
+        finally:
+            self.file.close()
+            os.unlink(self.temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+class DirectoryWriter:
+    '''
+    DirectoryWriter writes text files into a directory with the interface
+    of ArchiveWriter, used when Rd files read from an archive are converted
+    into a directory.
+    '''
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, filename, content):
+        write_file(os.path.join(self.directory, filename), content)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+def open_writer(path, archive_format=None):
+    '''
+    Returns an ArchiveWriter if path is an archive, "-" or archive_format is
+    given, otherwise a DirectoryWriter.
+    '''
+    if archive_format or is_archive(path):
+        return ArchiveWriter(path, archive_format)
+    return DirectoryWriter(path)
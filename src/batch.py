@@ -0,0 +1,251 @@
+import json
+import os
+from collections import namedtuple
+
+from src.file_writer import write_file
+from src.limits import DEFAULT_LIMITS
+from src.man_reader import ManReader, close_parse_caches, convert_file
+from src.profiler import profiler
+from src.render_cache import add_stats
+from src.renderers import DEFAULT_FORMATS
+from src.toctree_reader import MissingFunctionError
+
+# Written next to the batch manifest unless the manifest gives another path
+BATCH_INDEX_FILENAME = "rd2sphinxrst-batchindex.json"
+
+# Bump whenever the format of the combined index changes
+BATCH_INDEX_VERSION = "1"
+
+# One package of a batch, the paths are absolute
+Package = namedtuple("Package", ["name", "man_dir", "toctree_dir", "output_dir", "url"])
+
+class BatchError(Exception):
+    '''
+    Raised when a batch manifest cannot be read.
+    '''
+
+def load_batch_manifest(filename):
+    '''
+    Returns the Packages and the path of the combined index of a batch
+    manifest, a JSON file like:
+
+        {"packages": [{"name": "mxnet", "man_dir": "mxnet/man",
+                       "toctree_dir": "mxnet/toctree", "output_dir": "doc/mxnet",
+                       "url": "http://github.com/apache/incubator-mxnet/blob/master/"},
+                      ...],
+         "index": "doc/rd2sphinxrst-batchindex.json"}
+
+    Relative paths are relative to the directory of the manifest. The name
+    defaults to the basename of output_dir, url to "" and index to
+    BATCH_INDEX_FILENAME next to the manifest.
+    '''
+    directory = os.path.dirname(os.path.abspath(filename))
+    try:
+        with open(filename) as f:
+            batch = json.load(f)
+        packages = []
+        for package in batch["packages"]:
+            paths = [os.path.normpath(os.path.join(directory, package[key]))
+                     for key in ("man_dir", "toctree_dir", "output_dir")]
+            name = package.get("name") or os.path.basename(paths[2])
+            packages.append(Package(name, *paths, url=package.get("url") or ""))
+        index_path = os.path.normpath(os.path.join(directory,
+                                                   batch.get("index", BATCH_INDEX_FILENAME)))
+    except (OSError, ValueError, KeyError, TypeError) as error:
+        raise BatchError("Cannot read the batch manifest {}: {}".format(filename, error))
+
+    names = [package.name for package in packages]
+    duplicates = sorted(set(name for name in names if names.count(name) > 1))
+    if duplicates:
+        raise BatchError("Duplicate package names in {}: {}".format(
+            filename, ", ".join(duplicates)))
+    output_dirs = [package.output_dir for package in packages]
+    if len(set(output_dirs)) != len(output_dirs):
+        raise BatchError("Packages of {} share an output_dir".format(filename))
+    return packages, index_path
+
+def get_batch_index(packages, man_readers, index_path):
+    '''
+    Returns the combined index of the functions of every package as a dict
+    ready to be saved as JSON:
+        - "packages" lists the name, url and output directory, relative to
+          the directory of the index, of every package
+        - "functions" maps every name and alias to the [package, page] of the
+          functions having it, package being a position in "packages" and
+          page the name of the RST file without its extension
+
+    A name found in several packages lists all of them, in the order of the
+    packages, so that cross-package references can be resolved, or reported
+    as ambiguous, without reading the search index of every package.
+
+    Parameter:
+    ----------
+    packages: [Package]
+        Packages of the batch
+
+    man_readers: [ManReader]
+        ManReader of each package, after its build
+
+    index_path: (str)
+        Path of the combined index
+    '''
+    directory = os.path.dirname(os.path.abspath(index_path))
+    functions = {}
+    for package_id, man_reader in enumerate(man_readers):
+        for name, entry in sorted(man_reader.index.entries.items()):
+            if entry.filename in man_reader.skipped:
+                continue
+            functions.setdefault(name, []).append([package_id, name])
+            if entry.alias and entry.alias != name:
+                functions.setdefault(entry.alias, []).append([package_id, name])
+    return {"version": BATCH_INDEX_VERSION,
+            "packages": [{"name": package.name, "url": package.url,
+                          "output_dir": os.path.relpath(package.output_dir, directory)}
+                         for package in packages],
+            "functions": functions}
+
+class BatchBuilder:
+    '''
+    BatchBuilder builds the documentation of several packages in one run,
+    with one pool of processes shared by all of them.
+
+    Every package keeps its own incremental build, as with
+    ManReader.write_rst: each output directory gets its RST files, toctree
+    pages, search index and manifest, identical to the ones of a separate
+    run. The Rd files to convert of every package are submitted to the pool
+    one by one, largest first, so a worker done with a file takes the next
+    one whatever its package, and a small package never leaves the other
+    workers idle. A package is finished, i.e. its toctree pages, search
+    index and manifest are written, as soon as its last file is converted,
+    while the workers go on with the other packages. Finally the combined
+    index of every function is written to index_path.
+
+    A package failing, e.g., with a MissingFunctionError, does not stop the
+    others: its error is kept in errors.
+
+    Usage:
+        packages, index_path = load_batch_manifest("batch.json")
+        builder = BatchBuilder(packages, index_path, jobs=0)
+        builder.build()
+
+    Parameter:
+    ----------
+    packages: [Package]
+        Packages to build
+
+    index_path: (str)
+        Path of the combined index
+
+    jobs, cache_dir, limits, formats: as for ManReader, shared by every package
+    '''
+    def __init__(self, packages, index_path, jobs=1, cache_dir=None,
+                 limits=DEFAULT_LIMITS, formats=DEFAULT_FORMATS):
+        self.packages = packages
+        self.index_path = index_path
+        self.jobs = jobs if jobs > 0 else os.cpu_count()
+        self.cache_dir = cache_dir
+        self.limits = limits
+        self.formats = tuple(formats)
+        self.man_readers = [ManReader(package.man_dir, cache_dir=cache_dir, limits=limits,
+                                      formats=formats)
+                            for package in packages]
+        # {package name: error} of the packages that failed
+        self.errors = {}
+
+    def build(self, force=False):
+        '''
+        Builds every package and writes the combined index. Returns the
+        errors of the packages that failed.
+        '''
+        self.errors = {}
+        toctree_files = {}
+        tasks = []
+        for package_id, (package, mr) in enumerate(zip(self.packages, self.man_readers)):
+            os.makedirs(package.output_dir, exist_ok=True)
+            toctree_files[package_id] = mr.start_build(package.output_dir,
+                                                       package.toctree_dir, package.url,
+                                                       force)
+            for filename, digest in mr.get_stale_files(package.output_dir,
+                                                       mr.filenames).items():
+                tasks.append((os.path.getsize(filename), package_id, filename, digest))
+        # Largest first, so that no large file is left for the end of the build
+        tasks.sort(key=lambda task: -task[0])
+
+        remaining = {package_id: 0 for package_id in range(len(self.packages))}
+        for _, package_id, _, _ in tasks:
+            remaining[package_id] += 1
+        for package_id, count in remaining.items():
+            if count == 0:
+                self.finish_package(package_id, toctree_files[package_id])
+
+        for package_id, digest, result in self.iter_convert_files(tasks):
+            self.man_readers[package_id].add_converted(result, digest)
+            remaining[package_id] -= 1
+            if remaining[package_id] == 0:
+                self.finish_package(package_id, toctree_files[package_id])
+
+        write_file(self.index_path, json.dumps(
+            get_batch_index(self.packages, self.man_readers, self.index_path),
+            sort_keys=True, separators=(",", ":")))
+        return self.errors
+
+    def iter_convert_files(self, tasks):
+        '''
+        Generator converting the Rd files of the (size, package_id, filename,
+        digest) tasks and yielding their (package_id, digest, result) as they
+        are done, result being what convert_file returns.
+        '''
+        if self.jobs == 1 or len(tasks) <= 1:
+            for _, package_id, filename, digest in tasks:
+                package = self.packages[package_id]
+                yield package_id, digest, convert_file(
+                    filename, package.output_dir, package.url, self.cache_dir,
+                    profiler.enabled, self.limits, self.formats)
+            return
+
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        close_parse_caches()
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            futures = {}
+            for _, package_id, filename, digest in tasks:
+                package = self.packages[package_id]
+                future = executor.submit(convert_file, filename, package.output_dir,
+                                         package.url, self.cache_dir, profiler.enabled,
+                                         self.limits, self.formats)
+                futures[future] = package_id, digest
+            for future in as_completed(futures):
+                package_id, digest = futures.pop(future)
+                yield package_id, digest, future.result()
+
+    def finish_package(self, package_id, toctree_files):
+        package = self.packages[package_id]
+        try:
+            self.man_readers[package_id].finish_build(package.output_dir, package.url,
+                                                      toctree_files)
+        except MissingFunctionError as error:
+            self.errors[package.name] = str(error)
+
+    @property
+    def skipped(self):
+        '''
+        {filename: why it was skipped} of the Rd files skipped in every package.
+        '''
+        skipped = {}
+        for mr in self.man_readers:
+            skipped.update(mr.skipped)
+        return skipped
+
+    @property
+    def cache_hits(self):
+        return sum(mr.cache_hits for mr in self.man_readers)
+
+    @property
+    def cache_misses(self):
+        return sum(mr.cache_misses for mr in self.man_readers)
+
+    @property
+    def render_stats(self):
+        render_stats = {}
+        for mr in self.man_readers:
+            add_stats(render_stats, mr.render_stats)
+        return render_stats
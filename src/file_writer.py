@@ -0,0 +1,100 @@
+import filecmp
+import json
+import os
+import tempfile
+
+# Permissions of the files created by open(filename, 'w'), given to the
+# temporary files which tempfile creates readable by their owner only
+UMASK = os.umask(0)
+os.umask(UMASK)
+FILE_MODE = 0o666 & ~UMASK
+
+def write_file(filename, content):
+    '''
+    Writes content into filename, unless the file already holds exactly the
+    same content. Leaving unchanged files alone keeps their mtime, so Sphinx
+    does not re-read pages that did not change.
+
+    The content is written to a temporary file next to filename, which is
+    then renamed to filename, so that a reader never sees a partly written
+    file, even if the build is interrupted.
+
+    Parameter:
+    ----------
+    filename: (str)
+        Path of the file to write
+
+    content: (str)
+        Text to write
+
+    Returns True if the file was written.
+    '''
+    if os.path.exists(filename):
+        with open(filename, 'r') as f:
+            if f.read() == content:
+                return False
+
+    directory, basename = os.path.split(filename)
+    fd, temp_filename = tempfile.mkstemp(prefix="." + basename + ".", suffix=".tmp",
+                                         dir=directory or ".")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        os.chmod(temp_filename, FILE_MODE)
+        os.replace(temp_filename, filename)
+    except BaseException:
+        os.unlink(temp_filename)
+        raise
+    return True
+
+def write_chunks(filename, chunks):
+    '''
+    Writes the text chunks into filename, like write_file, without joining
+    them, so that a large file, e.g., the manifest, is never held in memory
+    whole. The chunks are written to the temporary file, which is then
+    compared with filename, and dropped if they are the same.
+
+    Returns True if the file was written.
+    '''
+    directory, basename = os.path.split(filename)
+    fd, temp_filename = tempfile.mkstemp(prefix="." + basename + ".", suffix=".tmp",
+                                         dir=directory or ".")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        if os.path.exists(filename) and filecmp.cmp(temp_filename, filename, shallow=False):
+            os.unlink(temp_filename)
+            return False
+        os.chmod(temp_filename, FILE_MODE)
+        os.replace(temp_filename, filename)
+    except BaseException:
+        if os.path.exists(temp_filename):
+            os.unlink(temp_filename)
+        raise
+    return True
+
+def iter_json(value, levels=1):
+    '''
+    Generator yielding value as compact JSON with sorted keys, i.e. the same
+    text as json.dumps(value, sort_keys=True, separators=(",", ":")), one
+    chunk per value of its dicts and item of its lists down to the given
+    number of levels, so that it can be written with write_chunks.
+    '''
+    if levels == 0 or not isinstance(value, (dict, list, tuple)):
+        yield json.dumps(value, sort_keys=True, separators=(",", ":"))
+        return
+    if not isinstance(value, dict):
+        separator = "["
+        for item in value:
+            yield separator
+            yield from iter_json(item, levels - 1)
+            separator = ","
+        yield "[]" if separator == "[" else "]"
+        return
+    separator = "{"
+    for key, item in sorted(value.items()):
+        yield separator + json.dumps(key) + ":"
+        yield from iter_json(item, levels - 1)
+        separator = ","
+    yield "{}" if separator == "{" else "}"
@@ -0,0 +1,76 @@
+import sys
+from collections import namedtuple
+
+from src.rd_reader import get_function_name
+
+# What the toctree pages and the search index need to know about a function
+FunctionEntry = namedtuple("FunctionEntry", ["title", "alias", "filename", "arguments",
+                                             "source"])
+
+class FunctionIndex:
+    '''
+    FunctionIndex maps the name of every function, i.e. the basename of its
+    Rd file, to its title, alias, filename, argument names and source code
+    location. It is built once by ManReader
+    and shared by all the TocTreeReaders, and can be rebuilt from the
+    manifest without parsing the Rd files.
+
+    Usage:
+        index = FunctionIndex()
+        index.add(rd_reader.get_summary())
+        index["mx.nd.abs"].title
+
+    Parameter:
+    ----------
+    rd_summaries: [RDSummary]
+        Optional summaries to add to the index
+    '''
+    def __init__(self, rd_summaries=()):
+        self.entries = {}
+        self.argument_lists = {}
+        for rd_summary in rd_summaries:
+            self.add(rd_summary)
+
+    def add(self, rd_summary):
+        self.set(rd_summary.filename, rd_summary.title, rd_summary.alias,
+                 rd_summary.arguments, rd_summary.source)
+
+    def set(self, filename, title, alias=None, arguments=(), source=None):
+        # The argument names and source files repeat from function to function,
+        # interning keeps one copy of each
+        arguments = tuple(sys.intern(argument) for argument in arguments)
+        # So do the lists of arguments, e.g., ("data",)
+        arguments = self.argument_lists.setdefault(arguments, arguments)
+        if source:
+            source = (sys.intern(source[0]),) + tuple(source[1:])
+        name = get_function_name(filename)
+        # The alias is mostly the name, the key is kept rather than a copy
+        if alias == name:
+            alias = name
+        self.entries[name] = FunctionEntry(title, alias, filename, arguments, source or None)
+
+    def remove(self, filename):
+        self.entries.pop(get_function_name(filename), None)
+
+    def get_title(self, name):
+        return self.entries[name].title
+
+    def get_missing(self, names):
+        '''
+        Returns the names that are not in the index, in order and without
+        duplicates.
+        '''
+        missing = []
+        for name in names:
+            if name not in self.entries and name not in missing:
+                missing.append(name)
+        return missing
+
+    def __getitem__(self, name):
+        return self.entries[name]
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,57 @@
+import contextlib
+import signal
+import threading
+from collections import namedtuple
+
+# Largest Rd file converted, in bytes, and longest time spent parsing and
+# rendering it, in seconds. 0 disables a limit.
+Limits = namedtuple("Limits", ["max_size", "max_seconds"])
+
+DEFAULT_LIMITS = Limits(max_size=16 * 1024 * 1024, max_seconds=60)
+
+class RdLimitError(Exception):
+    '''
+    Raised when an Rd file is larger or takes longer to convert than the
+    Limits of the build.
+    '''
+
+def check_size(size, limits):
+    '''
+    Raises an RdLimitError if a file of size bytes is over the limits.
+    '''
+    if limits.max_size and size > limits.max_size:
+        raise RdLimitError("{} bytes, more than the limit of {} bytes".format(
+            size, limits.max_size))
+
+@contextlib.contextmanager
+def time_limit(seconds):
+    '''
+    Context manager raising an RdLimitError in its block once it ran for
+    seconds. The limit needs SIGALRM, so it is only enforced in the main
+    thread of a process on Unix, e.g., in the worker processes of --jobs,
+    and ignored elsewhere.
+    '''
+    if not seconds or not hasattr(signal, "setitimer") or \
+            threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def on_alarm(signum, frame):
+        raise RdLimitError("took more than the limit of {} seconds".format(seconds))
+
+    previous_handler = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+def format_error(error):
+    '''
+    Returns why a file was skipped, e.g.,
+    "KeyError: 'description'" or "took more than the limit of 60 seconds"
+    '''
+    if isinstance(error, RdLimitError):
+        return str(error)
+    return "{}: {}".format(type(error).__name__, error)
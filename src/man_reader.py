@@ -1,56 +1,603 @@
 import glob
+import hashlib
 import os
+import time
+from collections import deque
+from itertools import repeat
 
-from src.rd_reader import RDReader
-from src.rst_builder import RSTBuilder
-from src.toctree_reader import TocTreeReader
+from src.archive import decode
+from src.file_writer import write_file
+from src.function_index import FunctionIndex
+from src.limits import DEFAULT_LIMITS, check_size, format_error, time_limit
+from src.manifest import Manifest, file_hash
+from src.profiler import profiler
+from src.rd_reader import RDReader, RDSummary, get_function_name, is_large_file
+from src.render_cache import add_stats, render_cache
+from src.renderers import DEFAULT_FORMATS, get_output_filenames, render_pages
+from src.search_index import (SEARCH_INDEX_FILENAME, dump_search_index, get_search_index,
+                              write_search_index)
+from src.shard import ShardFile, get_shard
+from src.toctree_reader import MissingFunctionError, TocTreeReader, check_missing_functions
+
+# ParseCache of each cache directory opened by this process. A SQLite
+# connection cannot be shared with the worker processes, so each opens its own,
+# and the ones of this process are closed before a pool is started.
+parse_caches = {}
+
+def get_parse_cache(cache_dir):
+    '''
+    Returns the ParseCache of cache_dir for this process, None if cache_dir is None.
+    '''
+    if cache_dir is None:
+        return None
+    if cache_dir not in parse_caches:
+        # Only imported with --cache-dir, sqlite3 is slow to import
+        from src.parse_cache import ParseCache
+        parse_caches[cache_dir] = ParseCache(cache_dir)
+    return parse_caches[cache_dir]
+
+def close_parse_caches():
+    '''
+    Closes the ParseCaches opened by this process. Called before starting a
+    pool of processes, so that the workers, which may be forked, do not
+    inherit an open SQLite connection. This process reopens its own when it
+    needs it again.
+    '''
+    while parse_caches:
+        _, parse_cache = parse_caches.popitem()
+        parse_cache.close()
+
+def convert_file(filename, output_path, url="", cache_dir=None, profile=False,
+                 limits=DEFAULT_LIMITS, formats=DEFAULT_FORMATS):
+    '''
+    Reads a single Rd file and writes its page in each of the formats, e.g.,
+    its RST file, parsing it once for all the formats. Returns the RDSummary
+    needed by the toctree pages, whether the parsed data came from the
+    cache, the timings of the file if profile is True and the hits and
+    misses of the render_cache. Runs inside the worker processes.
+
+    A file over the limits, or that cannot be converted, is skipped: no page
+    is written and the error of the RDSummary says why.
+    '''
+    if profile and not profiler.enabled:
+        profiler.enable()
+    profiler.set_file(filename)
+    try:
+        check_size(os.path.getsize(filename), limits)
+        with time_limit(limits.max_seconds):
+            rd_file = RDReader(filename, cache=get_parse_cache(cache_dir))
+            pages = render_pages(rd_file, url, formats)
+    except Exception as error:
+        rd_summary, _, from_cache, timings, render_stats = skip_file(filename, error, profile)
+        return rd_summary, from_cache, timings, render_stats
+    with profiler.timer("write"):
+        for output_filename, page in pages:
+            write_file(os.path.join(output_path, output_filename), page)
+    timings = profiler.pop_file(filename) if profile else None
+    return rd_file.get_summary(), rd_file.from_cache, timings, render_cache.pop_stats()
+
+def convert_text(filename, rd_text, url="", cache_dir=None, profile=False,
+                 limits=DEFAULT_LIMITS, formats=DEFAULT_FORMATS):
+    '''
+    Converts the content of a single Rd file, given as text or as the bytes
+    of the file, without reading or writing any file besides the ParseCache
+    of cache_dir. Returns its RDSummary, the (output filename, page) of each
+    of the formats, whether the parsed data
+    came from the cache, the timings of the file if profile is True and the
+    hits and misses of the render_cache. Runs inside the worker processes.
+
+    A file over the limits, or that cannot be converted, is skipped: its
+    pages are None and the error of the RDSummary says why.
+    '''
+    if profile and not profiler.enabled:
+        profiler.enable()
+    profiler.set_file(filename)
+    try:
+        check_size(len(rd_text), limits)
+        with time_limit(limits.max_seconds):
+            if isinstance(rd_text, bytes) and not is_large_file(len(rd_text)):
+                rd_text = decode(rd_text)
+            rd_reader = RDReader(filename, cache=get_parse_cache(cache_dir),
+                                 file_content=rd_text)
+            pages = render_pages(rd_reader, url, formats)
+    except Exception as error:
+        return skip_file(filename, error, profile)
+    timings = profiler.pop_file(filename) if profile else None
+    return (rd_reader.get_summary(), pages, rd_reader.from_cache, timings,
+            render_cache.pop_stats())
+
+def skip_file(filename, error, profile=False):
+    '''
+    Returns the (RDSummary, pages, from_cache, timings, render_stats) of a
+    file skipped because of error.
+    '''
+    timings = profiler.pop_file(filename) if profile else None
+    return (RDSummary(filename, error=format_error(error)), None, False, timings,
+            render_cache.pop_stats())
+
+def read_rd_file(filename, output_filenames):
+    '''
+    Reads an Rd file and checks if its pages exist. Returns the content of
+    the file, its hash, whether every page exists and the time spent. Runs
+    inside the reader threads of the pipeline.
+    '''
+    start = time.perf_counter()
+    with open(filename, 'rb') as rd_file:
+        data = rd_file.read()
+    output_exists = all(os.path.exists(output_filename)
+                        for output_filename in output_filenames)
+    return data, hashlib.sha256(data).hexdigest(), output_exists, time.perf_counter() - start
+
+def write_page(output_filename, page):
+    '''
+    Writes a page, e.g., an RST file, and returns the time spent. Runs inside
+    the writer threads of the pipeline.
+    '''
+    start = time.perf_counter()
+    write_file(output_filename, page)
+    return time.perf_counter() - start
+
+def bounded_map(executor, func, args_iterable, window):
+    '''
+    Generator submitting func(*args) to the executor for every args of
+    args_iterable, and yielding the results in order. At most window calls
+    are pending at a time, so that args_iterable is consumed only as fast as
+    the results are, e.g., the Rd files of a large archive are not all read
+    into memory.
+    '''
+    pending = deque()
+    for args in args_iterable:
+        pending.append(executor.submit(func, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
 
 class ManReader:
     '''
     ManReader reads a folder containing R Markdown files.
 
+    Builds are incremental: a manifest saved in the output directory records
+    the hash of every Rd and toctree JSON file, and files that did not change
+    since the last build are neither parsed nor written again.
+
     Usage:
         mr = ManReader(path_to_rd_files)
-        for rst in mr.get_rst():
-            rst.write_rst_file(path_to_save_rsts)
+        mr.write_rst(path_to_save_rsts, path_to_toctree_files)
 
 
     Parameter:
     ----------
     filepath: (str)
         Filepath of the R markdown files
+
+    jobs: (int)
+        Number of processes used to convert the files, 0 uses every core.
+
+    cache_dir: (str)
+        Directory of the ParseCache used to read the files, no cache if None.
+        The hits and misses are counted in cache_hits and cache_misses.
+
+    limits: (Limits)
+        Largest size and longest conversion time of an Rd file. The files
+        over the limits, or that cannot be converted, e.g., because they are
+        malformed, are skipped and listed with the reason in skipped, so
+        that one bad file does not stop or hang the whole build.
+
+    io_threads: (int)
+        Number of threads reading the Rd files and of threads writing the
+        RST files, 0 reads and writes them in the converting processes. With
+        threads, the conversion is a pipeline overlapping the reads, the
+        conversions and the writes, which hides the latency of each file
+        access on network filesystems.
+
+    formats: ([str])
+        Formats of the pages written for each Rd file, see RENDERERS, e.g.,
+        ("rst", "md", "json"). Every file is parsed once and rendered in
+        each format. The toctree pages are only written in RST.
+
+    The hits and misses of the render_cache of every process are summed in
+    render_stats.
     '''
-    def __init__(self, filepath):
-        self.rd_files = self.read_files(filepath)
+    def __init__(self, filepath, jobs=1, cache_dir=None, io_threads=0,
+                 limits=DEFAULT_LIMITS, formats=DEFAULT_FORMATS):
+        self.jobs = jobs if jobs > 0 else os.cpu_count()
+        self.formats = tuple(formats)
+        self.io_threads = io_threads
+        self.limits = limits
+        # {filename: why it was skipped} of the Rd files skipped by the builds
+        self.skipped = {}
+        self.cache_dir = cache_dir
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.render_stats = {}
+        self.filenames = sorted(glob.glob(os.path.join(filepath, "*.Rd")))
+        # State of the last build, kept so that it can be updated by update()
+        self.manifest = None
+        self.index = FunctionIndex()
+        self.toctree_readers = {}
+        self.toctree_digests = {}
 
-    def read_files(self, filepath):
+    def write_rst(self, output_path, toctree_dir, url="", force=False):
         '''
-        Helper function to read all the MD files in a directory
+        Convert RDfiles and JSON files into RST files
+
+        Parameter:
+        ---------
+        output_path: str
+            Location to save the RST files
+
+        toctree_dir: str
+            Input directory of the toctree JSON files
+
+        url: str
+            URL of the repository
+
+        force: bool
+            Ignore the manifest and convert every file
         '''
-        rd_files = []
-        for rd_file in glob.glob(os.path.join(filepath, "*.Rd")):
-            rd_files.append(RDReader(rd_file))
-        return rd_files
+        toctree_files = self.start_build(output_path, toctree_dir, url, force)
+        self.update(output_path, url, self.filenames, toctree_files)
 
-    def write_rst(self, output_path, toctree_dir, url=""):
+    def start_build(self, output_path, toctree_dir, url="", force=False):
         '''
-        Convert RDfiles and JSON files into RST files
-        
+        Forgets the state of the previous build and loads the manifest of
+        output_path. Returns the toctree JSON files of toctree_dir.
+        '''
+        self.manifest = Manifest(output_path, url)
+        if force:
+            self.manifest.clear()
+        self.index = FunctionIndex()
+        self.skipped = {}
+        self.toctree_readers = {}
+        self.toctree_digests = {}
+        return sorted(glob.glob(os.path.join(toctree_dir, "*.json")))
+
+    def update(self, output_path, url, rd_files, toctree_files, removed_files=()):
+        '''
+        Convert the given Rd files whose content changed since the last build,
+        (re)load the given toctree JSON files, and write the toctree pages whose
+        JSON or referenced titles changed. write_rst calls it with every file;
+        the Watcher calls it with the files changed since the previous call.
+
+        Every function of the API tables of the toctree files is checked before any
+        toctree page is written, and a MissingFunctionError listing all the
+        missing ones is raised if needed.
+
         Parameter:
         ---------
         output_path: str
             Location to save the RST files
 
+        url: str
+            URL of the repository
+
+        rd_files: [str]
+            Rd files that are new or may have changed
+
+        toctree_files: [str]
+            Toctree JSON files that are new or may have changed
+
+        removed_files: [str]
+            Rd and toctree JSON files that were deleted
+        '''
+        for filename in removed_files:
+            self.index.remove(filename)
+            self.skipped.pop(filename, None)
+            self.toctree_readers.pop(filename, None)
+            self.toctree_digests.pop(filename, None)
+
+        # Only the FunctionIndex is kept for the toctree pages, the RDReaders
+        # are dropped as soon as their RST file is written.
+        stale_digests = {}
+        if self.io_threads > 0:
+            converted = self.iter_pipeline(rd_files, output_path, url, stale_digests)
+        else:
+            stale_digests = self.get_stale_files(output_path, rd_files)
+            converted = self.iter_convert_files(list(stale_digests), output_path, url)
+        for result in converted:
+            self.add_converted(result, stale_digests[result[0].filename])
+        # The hashes are in the manifest, they are not held during the final stage
+        del stale_digests, converted
+        self.finish_build(output_path, url, toctree_files)
+
+    def get_stale_files(self, output_path, rd_files):
+        '''
+        Adds the Rd files unchanged since the last build to the index, and
+        returns {filename: hash} of the ones to convert.
+        '''
+        stale_digests = {}
+        for filename in rd_files:
+            digest = file_hash(filename)
+            entry = self.manifest.get_rd_file(filename, digest)
+            if entry is not None and all(
+                    os.path.exists(os.path.join(output_path, output_filename))
+                    for output_filename in get_output_filenames(filename, self.formats)):
+                self.add_unchanged(filename, digest, entry)
+            else:
+                stale_digests[filename] = digest
+        return stale_digests
+
+    def add_unchanged(self, filename, digest, entry):
+        '''
+        Adds an Rd file unchanged since the last build, given as its recorded
+        FunctionEntry, to the index, and records the entry of the index in the
+        manifest in its place.
+        '''
+        self.index.set(filename, entry.title, entry.alias, entry.arguments, entry.source)
+        self.manifest.set_rd_file(filename, digest, self.index[get_function_name(filename)])
+
+    def add_converted(self, result, digest):
+        '''
+        Records a converted Rd file, given as the (RDSummary, from_cache,
+        timings, render_stats) of convert_file, and the hash of its content.
+        '''
+        rd_summary, from_cache, timings, render_stats = result
+        if timings is not None:
+            profiler.add_file(rd_summary.filename, timings)
+        add_stats(self.render_stats, render_stats)
+        if from_cache:
+            self.cache_hits += 1
+        elif self.cache_dir is not None:
+            self.cache_misses += 1
+        self.index.add(rd_summary)
+        if self.skip(rd_summary):
+            # Not in the manifest, so that the next build tries again
+            return
+        self.manifest.set_rd_file(rd_summary.filename, digest,
+                                  self.index[get_function_name(rd_summary.filename)])
+
+    def finish_build(self, output_path, url, toctree_files):
+        '''
+        (Re)loads the given toctree JSON files, checks the functions they
+        refer to, writes the toctree pages whose JSON or referenced titles
+        changed and the search index, and saves the manifest.
+        '''
+        manifest = self.manifest
+        for toctree_file in toctree_files:
+            self.toctree_readers[toctree_file] = TocTreeReader(toctree_file, index=self.index)
+            self.toctree_digests[toctree_file] = file_hash(toctree_file)
+        manifest.keep_only(self.filenames, self.toctree_readers)
+
+        try:
+            self.check_missing_functions()
+        except MissingFunctionError:
+            # Keep the converted Rd files for the next build
+            manifest.save()
+            raise
+
+        for toctree_file in sorted(self.toctree_readers):
+            tt = self.toctree_readers[toctree_file]
+            digest = self.toctree_digests[toctree_file]
+            toctree_titles = tt.get_titles()
+            output_filename = os.path.join(output_path, tt.get_output_filename())
+            if manifest.is_toctree_current(toctree_file, digest, toctree_titles) and \
+                    os.path.exists(output_filename):
+                continue
+            profiler.set_file(toctree_file)
+            with profiler.timer("toctree"):
+                tt.write_rst_file(output_path)
+            manifest.set_toctree(toctree_file, digest, toctree_titles)
+        write_search_index(os.path.join(output_path, SEARCH_INDEX_FILENAME),
+                           get_search_index(self.index, url, self.skipped))
+        manifest.save()
+
+    def write_rst_shard(self, output_path, index, count, url=""):
+        '''
+        Convert the Rd files of one shard of the build, i.e., the files for
+        which get_shard gives index, and save the ShardFile of the shard in
+        output_path. The toctree pages are written by merge_shards once every
+        shard is done. There is no manifest, every file of the shard is
+        converted. Returns the path of the ShardFile.
+
+        Parameter:
+        ---------
+        output_path: str
+            Location to save the RST files and the ShardFile
+
+        index: int
+            Shard to convert, from 1 to count
+
+        count: int
+            Number of shards
+
+        url: str
+            URL of the repository
+        '''
+        os.makedirs(output_path, exist_ok=True)
+        self.skipped = {}
+        shard_file = ShardFile(index, count, url)
+        filenames = [filename for filename in self.filenames
+                     if get_shard(filename, count) == index]
+        for rd_summary, from_cache, timings, render_stats in self.iter_convert_files(
+                filenames, output_path, url):
+            if timings is not None:
+                profiler.add_file(rd_summary.filename, timings)
+            add_stats(self.render_stats, render_stats)
+            if from_cache:
+                self.cache_hits += 1
+            elif self.cache_dir is not None:
+                self.cache_misses += 1
+            if self.skip(rd_summary):
+                shard_file.set_skipped_file(rd_summary.filename, rd_summary.error)
+                continue
+            shard_file.set_rd_file(rd_summary, file_hash(rd_summary.filename), {
+                output_filename: file_hash(os.path.join(output_path, output_filename))
+                for output_filename in get_output_filenames(rd_summary.filename,
+                                                            self.formats)})
+        return shard_file.save(output_path)
+
+    def write_rst_archive(self, rd_files, writer, toctree_dir, url=""):
+        '''
+        Convert Rd files read from an archive, or from any iterable, and write
+        their pages and then the toctree pages with a writer, e.g., into
+        an archive. The files are streamed one at a time and only the
+        FunctionIndex is kept, nothing is written to disk besides the output
+        of the writer. There is no manifest, every file is converted.
+
+        Usage:
+            with ArchiveWriter("doc.tar.gz") as writer:
+                mr.write_rst_archive(iter_rd_files("mxnet.tar.gz"), writer, toctree_dir)
+
+        Parameter:
+        ---------
+        rd_files: iterable of (str, str)
+            Filename and content of each Rd file e.g., iter_rd_files(path)
+
+        writer: ArchiveWriter or DirectoryWriter
+            Writer of the pages
+
         toctree_dir: str
             Input directory of the toctree JSON files
 
         url: str
             URL of the repository
         '''
-        for toctree_file in glob.glob(os.path.join(toctree_dir, "*.json")):
-            tt = TocTreeReader(toctree_file, self.rd_files)
-            tt.write_rst_file(output_path)
+        self.skipped = {}
+        self.index = FunctionIndex()
+        for rd_summary, pages, _, timings, render_stats in self.iter_convert_texts(
+                rd_files, url):
+            if timings is not None:
+                profiler.add_file(rd_summary.filename, timings)
+            add_stats(self.render_stats, render_stats)
+            self.index.add(rd_summary)
+            if self.skip(rd_summary):
+                continue
+            profiler.set_file(rd_summary.filename)
+            with profiler.timer("write"):
+                for output_filename, page in pages:
+                    writer.write(output_filename, page)
+
+        toctree_files = sorted(glob.glob(os.path.join(toctree_dir, "*.json")))
+        self.toctree_readers = {toctree_file: TocTreeReader(toctree_file, index=self.index)
+                                for toctree_file in toctree_files}
+        self.check_missing_functions()
+        for toctree_file in toctree_files:
+            tt = self.toctree_readers[toctree_file]
+            profiler.set_file(toctree_file)
+            with profiler.timer("toctree"):
+                writer.write(tt.get_output_filename(), tt.get_rst())
+        writer.write(SEARCH_INDEX_FILENAME,
+                     dump_search_index(get_search_index(self.index, url, self.skipped)))
+
+    def skip(self, rd_summary):
+        '''
+        Records why the file of rd_summary was skipped, if it was. Returns
+        True if it was skipped. The skipped files are still in the index, with
+        no title, so that the toctree pages listing them are written.
+        '''
+        if rd_summary.error is None:
+            self.skipped.pop(rd_summary.filename, None)
+            return False
+        self.skipped[rd_summary.filename] = rd_summary.error
+        return True
+
+    def check_missing_functions(self):
+        '''
+        Raises a MissingFunctionError listing the functions of the API tables
+        of the toctree files that are not in the index.
+        '''
+        check_missing_functions(self.toctree_readers)
+
+    def iter_convert_texts(self, rd_files, url="", cache_dir=None):
+        '''
+        Generator converting the (filename, content) of Rd files one at a time
+        and yielding their (RDSummary, pages, from_cache, timings,
+        render_stats) in order. With more than one job at most 4 files per job
+        are sent to the pool at a time, so that the files of a large archive
+        are not all read into memory.
+        '''
+        if self.jobs == 1:
+            for filename, rd_text in rd_files:
+                yield convert_text(filename, rd_text, url, cache_dir, profiler.enabled,
+                                   self.limits, self.formats)
+            return
+
+        # concurrent.futures, and multiprocessing, are only imported with
+        # --jobs or --io-threads, a serial build starts faster without them
+        from concurrent.futures import ProcessPoolExecutor
+        close_parse_caches()
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            yield from bounded_map(executor, convert_text,
+                                   ((filename, rd_text, url, cache_dir, profiler.enabled,
+                                     self.limits, self.formats)
+                                    for filename, rd_text in rd_files),
+                                   self.jobs * 4)
+
+    def iter_pipeline(self, rd_files, output_path, url, stale_digests):
+        '''
+        Generator converting the Rd files whose content changed since the last
+        build in a pipeline of three bounded stages: io_threads threads read
+        the files and check the manifest, the files are converted by
+        iter_convert_texts, and io_threads threads write the pages. At most 4
+        files, or pages, per thread wait in each stage. Adds the unchanged files
+        to the index and the hash of the changed ones to stale_digests, and
+        yields the (RDSummary, from_cache, timings, render_stats) of the
+        converted files in order, like iter_convert_files.
+        '''
+        manifest = self.manifest
+        window = self.io_threads * 4
+
+        def iter_stale_files(reads):
+            for filename, (data, digest, output_exists, seconds) in zip(rd_files, reads):
+                if profiler.enabled:
+                    profiler.add("read", seconds, filename)
+                entry = manifest.get_rd_file(filename, digest)
+                if entry is not None and output_exists:
+                    self.add_unchanged(filename, digest, entry)
+                else:
+                    stale_digests[filename] = digest
+                    yield filename, data
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(self.io_threads) as readers, \
+                ThreadPoolExecutor(self.io_threads) as writers:
+            reads = bounded_map(readers, read_rd_file,
+                                ((filename, [os.path.join(output_path, output_filename)
+                                             for output_filename in
+                                             get_output_filenames(filename, self.formats)])
+                                 for filename in rd_files),
+                                window)
+            pending = deque()
+            for rd_summary, pages, from_cache, timings, render_stats in \
+                    self.iter_convert_texts(iter_stale_files(reads), url, self.cache_dir):
+                for output_filename, page in pages or ():
+                    pending.append((rd_summary.filename, writers.submit(
+                        write_page, os.path.join(output_path, output_filename), page)))
+                while len(pending) >= window:
+                    self.add_write_time(*pending.popleft())
+                yield rd_summary, from_cache, timings, render_stats
+            while pending:
+                self.add_write_time(*pending.popleft())
+
+    @staticmethod
+    def add_write_time(filename, future):
+        '''
+        Waits for a write of the pipeline, raising its error if it failed.
+        '''
+        seconds = future.result()
+        if profiler.enabled:
+            profiler.add("write", seconds, filename)
+
+    def iter_convert_files(self, filenames, output_path, url=""):
+        '''
+        Generator converting the given Rd files one at a time and yielding
+        their (RDSummary, from_cache, timings, render_stats) in order. With more than one job the
+        conversion is sharded across a pool of processes and only the
+        RDSummary of each file is sent back.
+        '''
+        if self.jobs == 1 or len(filenames) <= 1:
+            for filename in filenames:
+                yield convert_file(filename, output_path, url, self.cache_dir,
+                                   profiler.enabled, self.limits, self.formats)
+            return
 
-        for rd_file in self.rd_files:
-            rst = RSTBuilder(rd_file, url)
-            rst.write_rst_file(output_path)
+        chunksize = max(1, len(filenames) // (self.jobs * 4))
+        from concurrent.futures import ProcessPoolExecutor
+        close_parse_caches()
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            yield from executor.map(convert_file, filenames,
+                                    repeat(output_path), repeat(url),
+                                    repeat(self.cache_dir), repeat(profiler.enabled),
+                                    repeat(self.limits), repeat(self.formats),
+                                    chunksize=chunksize)
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+
+from src.file_writer import iter_json, write_chunks
+from src.function_index import FunctionEntry
+
+# Bump whenever a change to the converter changes the generated RST,
+# so that the next incremental build regenerates every file.
+CONVERTER_VERSION = "3"
+
+MANIFEST_FILENAME = ".rd2sphinxrst-manifest.json"
+
+def file_hash(filename):
+    '''
+    Helper function to get the SHA-256 hex digest of the content of a file.
+    '''
+    with open(filename, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+class Manifest:
+    '''
+    Manifest records what was used to build the files in an output directory
+    so that the next build only converts what changed.
+
+    It is saved as JSON in the output directory and holds the converter
+    version, the URL and:
+        - for each Rd file: the hash of its content, its title, its alias, its
+          argument names and its source code location, i.e. what the toctree
+          pages and the search index need
+        - for each toctree JSON file: the hash of its content and the titles
+          of the functions listed in its API tables
+
+    In memory, each Rd file is its hash and the FunctionEntry of the
+    FunctionIndex, so that the entries are not held twice.
+
+    A manifest written by another converter version or with another URL is
+    ignored, i.e. everything is rebuilt.
+
+    Parameter:
+    ----------
+    directory: (str)
+        Output directory holding the manifest
+
+    url: (str)
+        URL of the repository used for the build
+    '''
+    def __init__(self, directory, url=""):
+        self.filename = os.path.join(directory, MANIFEST_FILENAME)
+        self.url = url or ""
+        self.clear()
+        self.load()
+
+    def clear(self):
+        '''
+        Forget all the recorded files.
+        '''
+        self.rd_files = {}
+        self.toctrees = {}
+
+    def load(self):
+        '''
+        Read the manifest from disk, if there is a usable one.
+        '''
+        if not os.path.exists(self.filename):
+            return
+        try:
+            with open(self.filename) as f:
+                manifest = json.load(f)
+        except ValueError:
+            return
+        if manifest.get("version") != CONVERTER_VERSION or manifest.get("url") != self.url:
+            return
+        self.rd_files = {
+            basename: (entry["hash"], FunctionEntry(
+                entry["title"], entry["alias"], basename, tuple(entry["arguments"]),
+                tuple(entry["source"]) if entry["source"] else None))
+            for basename, entry in manifest.get("rd_files", {}).items()}
+        self.toctrees = manifest.get("toctrees", {})
+
+    def save(self):
+        '''
+        Write the manifest to disk. It is written entry by entry, never held
+        whole in memory.
+        '''
+        rd_files = ((basename, {"hash": digest, "title": entry.title, "alias": entry.alias,
+                                "arguments": entry.arguments, "source": entry.source})
+                    for basename, (digest, entry) in sorted(self.rd_files.items()))
+        write_chunks(self.filename, self.iter_json(rd_files))
+
+    def iter_json(self, rd_files):
+        '''
+        Generator yielding the chunks of the JSON of the manifest, the same
+        text as json.dumps with sorted keys and compact separators.
+        '''
+        yield "{\"rd_files\":{"
+        separator = ""
+        for basename, entry in rd_files:
+            yield separator + json.dumps(basename) + ":"
+            yield from iter_json(entry, 0)
+            separator = ","
+        yield "},\"toctrees\":"
+        yield from iter_json(self.toctrees, 1)
+        yield ",\"url\":{},\"version\":{}}}".format(json.dumps(self.url),
+                                                    json.dumps(CONVERTER_VERSION))
+
+    def get_rd_file(self, filename, digest):
+        '''
+        Returns the recorded FunctionEntry of the Rd file if it was converted
+        with the same content, otherwise None.
+        '''
+        recorded = self.rd_files.get(os.path.basename(filename))
+        if recorded is not None and recorded[0] == digest:
+            return recorded[1]
+        return None
+
+    def set_rd_file(self, filename, digest, entry):
+        '''
+        Records the hash and the FunctionEntry, e.g., index[name], of an Rd file.
+        '''
+        self.rd_files[os.path.basename(filename)] = (digest, entry)
+
+    def is_toctree_current(self, filename, digest, titles):
+        '''
+        Returns True if the toctree JSON file and the titles it uses are
+        unchanged.
+        '''
+        entry = self.toctrees.get(os.path.basename(filename))
+        return entry is not None and entry["hash"] == digest and entry["titles"] == titles
+
+    def set_toctree(self, filename, digest, titles):
+        self.toctrees[os.path.basename(filename)] = {"hash": digest, "titles": titles}
+
+    def keep_only(self, rd_filenames, toctree_filenames):
+        '''
+        Drop the entries of files that no longer exist.
+        '''
+        rd_basenames = set(os.path.basename(f) for f in rd_filenames)
+        toctree_basenames = set(os.path.basename(f) for f in toctree_filenames)
+        for k in [k for k in self.rd_files if k not in rd_basenames]:
+            del self.rd_files[k]
+        self.toctrees = {k: v for k, v in self.toctrees.items() if k in toctree_basenames}
@@ -0,0 +1,148 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+
+from src.rd_reader import PARSER_VERSION
+
+CACHE_FILENAME = "rd_parse_cache.sqlite"
+
+# Default upper bound of the pickled data kept in the cache
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+class ParseCache:
+    '''
+    ParseCache is an on-disk SQLite store of the parsed data of Rd files so
+    that RDReader does not read and parse a file it has already seen.
+
+    An entry is used when the path, size and mtime of the file are unchanged.
+    If only the size or mtime changed, the bytes of the file are hashed and
+    the entry is still used when the hash matches. Entries made by another PARSER_VERSION
+    are ignored. When the cache grows over max_size bytes the least recently
+    used entries are evicted.
+
+    Usage:
+        cache = ParseCache(cache_dir)
+        rd = RDReader(filename, cache=cache)
+        print(cache.hits, cache.misses)
+
+    Parameter:
+    ----------
+    directory: (str)
+        Directory holding the cache, created if needed
+
+    max_size: (int)
+        Maximum size in bytes of the cached data
+    '''
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # The cache can be shared by several processes, e.g. with --jobs
+        self.connection = sqlite3.connect(os.path.join(directory, CACHE_FILENAME),
+                                          timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, hash TEXT, "
+            "version TEXT, data BLOB, nbytes INTEGER, last_used REAL)")
+        self.connection.commit()
+
+    def get(self, filename):
+        '''
+        Returns the cached data of the Rd file, None if there is no valid entry.
+        '''
+        path = os.path.abspath(filename)
+        row = self.connection.execute(
+            "SELECT size, mtime, hash, version, data FROM entries WHERE path = ?",
+            (path,)).fetchone()
+        if row is None or row[3] != PARSER_VERSION:
+            self.misses += 1
+            return None
+
+        size, mtime, digest, _, data = row
+        stat = os.stat(path)
+        if (stat.st_size, stat.st_mtime_ns) != (size, mtime):
+            # The file was touched, check if the content actually changed
+            if file_content_hash(path) != digest:
+                self.misses += 1
+                return None
+            self.connection.execute(
+                "UPDATE entries SET size = ?, mtime = ? WHERE path = ?",
+                (stat.st_size, stat.st_mtime_ns, path))
+
+        self.connection.execute("UPDATE entries SET last_used = ? WHERE path = ?",
+                                (time.time(), path))
+        self.connection.commit()
+        self.hits += 1
+        return pickle.loads(data)
+
+    def put(self, filename, file_content, data):
+        '''
+        Stores the parsed data of the Rd file.
+
+        Parameter:
+        ----------
+        filename: (str)
+            Filename of the Rd file
+
+        file_content: (str)
+            Content of the file that was parsed, or its bytes. The entry
+            records the hash of the bytes of the file, which get compares with
+            the file, so the file is hashed again if its text is given, as its
+            newlines may have been translated
+
+        data: (dict)
+            RDReader.data parsed from file_content
+        '''
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime_ns,
+             file_content_hash(path) if isinstance(file_content, str)
+             else content_hash(file_content),
+             PARSER_VERSION, blob, len(blob), time.time()))
+        self.evict()
+        self.connection.commit()
+
+    def evict(self):
+        '''
+        Removes the least recently used entries until the cache fits in max_size.
+        '''
+        total_size = self.connection.execute(
+            "SELECT COALESCE(SUM(nbytes), 0) FROM entries").fetchone()[0]
+        if total_size <= self.max_size:
+            return
+        rows = self.connection.execute(
+            "SELECT path, nbytes FROM entries ORDER BY last_used").fetchall()
+        for path, nbytes in rows:
+            if total_size <= self.max_size:
+                break
+            self.connection.execute("DELETE FROM entries WHERE path = ?", (path,))
+            total_size -= nbytes
+
+    def close(self):
+        self.connection.close()
+
+def content_hash(file_content):
+    '''
+    Helper function to get the SHA-256 hex digest of the bytes of an Rd file,
+    e.g., an mmap.
+    '''
+    return hashlib.sha256(file_content).hexdigest()
+
+def file_content_hash(filename, block_size=1024 * 1024):
+    '''
+    Helper function to get the SHA-256 hex digest of the bytes of an Rd file
+    read block by block, so that a large file is not held in memory.
+    '''
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as rd_file:
+        for block in iter(lambda: rd_file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,40 @@
+import re
+
+# Every regular expression of the converter as (pattern, flags). They are
+# compiled by get_pattern the first time they are used, once per process,
+# so a run only compiles the ones it needs.
+PATTERNS = {
+    # Everything RDLexer has to look at in an Rd file. Plain text between the
+    # tokens is skipped by the regex engine rather than walked in Python.
+    # 1) a macro e.g., \item, 2) an escaped character e.g., \{ or \%,
+    # 3) a % comment to the end of the line, 4) an opening or closing brace
+    "rd_token": (r"\\([A-Za-z]+)|\\.|%[^\n]*|[{}]", re.DOTALL),
+    # The same tokens in the undecoded bytes of a file, where the lines may
+    # still end with \r\n or \r
+    "rd_token_bytes": (rb"\\([A-Za-z]+)|\\.|%[^\r\n]*|[{}]", re.DOTALL),
+    # The tokens of R-like text, i.e. \usage, \examples and \code, which
+    # also has 5) "..." and '...' strings, whose braces are not counted. A
+    # quote not closed on its line is plain text, e.g., an apostrophe.
+    "rd_token_r_like": (r"\\([A-Za-z]+)|\\.|%[^\n]*|"
+                        r"(\"(?:[^\"\\\n]|\\.)*\"|'(?:[^'\\\n]|\\.)*')|[{}]", re.DOTALL),
+    "rd_token_r_like_bytes": (rb"\\([A-Za-z]+)|\\.|%[^\r\n]*|"
+                              rb"(\"(?:[^\"\\\r\n]|\\.)*\"|'(?:[^'\\\r\n]|\\.)*')|[{}]",
+                              re.DOTALL),
+    # Cells made only of printable ASCII characters and newlines have the
+    # same width for every terminal, and can't be ANSI codes or tabulate's
+    # separating lines
+    "table_unsupported_characters": (r"[^\n\x20-\x7e]", 0),
+    # Words of the names, aliases, titles and arguments in the search index
+    "search_term": (r"[a-z0-9]+", 0),
+}
+
+compiled_patterns = {}
+
+def get_pattern(name):
+    '''
+    Returns the compiled pattern of PATTERNS called name.
+    '''
+    pattern = compiled_patterns.get(name)
+    if pattern is None:
+        pattern = compiled_patterns[name] = re.compile(*PATTERNS[name])
+    return pattern
@@ -0,0 +1,138 @@
+import functools
+import json
+import time
+
+class Timer:
+    '''
+    Context manager adding the time spent in its block to a stage of the
+    current file of a Profiler.
+    '''
+    __slots__ = ("profiler", "stage", "start")
+
+    def __init__(self, profiler, stage):
+        self.profiler = profiler
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.stage, time.perf_counter() - self.start)
+        return False
+
+class NullTimer:
+    '''
+    Context manager doing nothing, used when the profiler is disabled.
+    '''
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_TIMER = NullTimer()
+
+class Profiler:
+    '''
+    Profiler records the time spent by each file in each stage of the
+    conversion: "read", "parse", "cache", "render", "write" and "toctree".
+    The sections of the RST pages are recorded as sub-stages of "render"
+    e.g., "render.arguments", and are not counted in the total of a file.
+
+    It is disabled by default, in which case timer() returns a shared
+    context manager that does nothing.
+
+    Usage:
+        profiler.enable()
+        profiler.set_file(filename)
+        with profiler.timer("parse"):
+            ...
+        profiler.write_report("profile.json")
+    '''
+    def __init__(self):
+        self.enabled = False
+        self.current_file = None
+        self.files = {}
+        self.start = None
+
+    def enable(self):
+        self.enabled = True
+        self.start = time.perf_counter()
+
+    def set_file(self, filename):
+        '''
+        Set the file the next timings are recorded for.
+        '''
+        self.current_file = filename
+
+    def timer(self, stage):
+        '''
+        Returns a context manager timing its block as the given stage of the
+        current file.
+        '''
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, stage)
+
+    def add(self, stage, seconds, filename=None):
+        stages = self.files.setdefault(filename or self.current_file, {})
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+    def pop_file(self, filename):
+        '''
+        Remove and return the timings of a file, used to send the timings of
+        the worker processes back to the main one.
+        '''
+        return self.files.pop(filename, {})
+
+    def add_file(self, filename, stages):
+        for stage, seconds in stages.items():
+            self.add(stage, seconds, filename)
+
+    def get_report(self, top=20):
+        '''
+        Returns the total time of each stage, the top slowest files and the
+        timings of every file.
+        '''
+        stages = {}
+        for file_stages in self.files.values():
+            for stage, seconds in file_stages.items():
+                total = stages.setdefault(stage, {"count": 0, "seconds": 0.0})
+                total["count"] += 1
+                total["seconds"] += seconds
+
+        file_totals = []
+        for filename, file_stages in self.files.items():
+            seconds = sum(s for stage, s in file_stages.items() if "." not in stage)
+            file_totals.append({"filename": filename, "seconds": seconds,
+                                "stages": file_stages})
+        file_totals.sort(key=lambda f: f["seconds"], reverse=True)
+
+        return {"total_seconds": time.perf_counter() - self.start if self.start else 0.0,
+                "stages": stages,
+                "slowest_files": file_totals[:top],
+                "files": self.files}
+
+    def write_report(self, filename, top=20):
+        with open(filename, 'w') as f:
+            json.dump(self.get_report(top), f, indent=2, sort_keys=True)
+
+# Profiler shared by the whole process
+profiler = Profiler()
+
+def timed(stage):
+    '''
+    Decorator timing every call of the function as the given stage.
+    '''
+    def decorator(func):
+        @functools.wraps(func)
+        def timed_func(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            with Timer(profiler, stage):
+                return func(*args, **kwargs)
+        return timed_func
+    return decorator
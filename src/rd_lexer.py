@@ -0,0 +1,161 @@
+from collections import namedtuple
+
+from src.patterns import get_pattern
+
+# Spans are (start, end) offsets into the lexed text, end exclusive.
+# Section: a top level category e.g., \name{...}, \arguments{...}
+# Item: an \item{name}{description} directly inside a section
+# Method: a \method{name}{model}(usage) directly inside a section, the usage
+# runs until the next \method or the end of the section
+Section = namedtuple("Section", ["name", "start", "end", "items", "methods"])
+Item = namedtuple("Item", ["name_start", "name_end", "start", "end"])
+Method = namedtuple("Method", ["name_start", "name_end", "model_start",
+                               "model_end", "start", "end"])
+
+# Macros with two brace arguments that are read inside a section
+SUBCATEGORY_MACROS = ("item", "method")
+
+# Sections and macros whose content is R-like text, where the braces of
+# "..." and '...' strings are not counted, as by R's Rd parser
+R_LIKE_SECTIONS = ("usage", "examples")
+R_LIKE_MACROS = ("code", "dontrun", "donttest", "dontshow", "testonly")
+
+
+class RDLexer:
+    '''
+    RDLexer walks the text of an R Markdown file once and returns the spans
+    of every top level category together with the \\item and \\method
+    entries directly inside it.
+
+    Braces are matched properly, so escaped braces (\\{, \\}) and % comments
+    are not counted and nested macros such as \\code{...} stay within the
+    category or item they belong to. Nor are the braces of the strings of
+    R-like text, e.g., \\usage{f(open = "{")}. The cost is linear in the file
+    size.
+
+    Usage:
+        text = open(path_to_rd_file).read()
+        for section in RDLexer(text).tokenize():
+            print(section.name, text[section.start:section.end])
+
+    Parameter:
+    ----------
+    text: (str)
+        Content of the R Markdown file, or its undecoded bytes, e.g., an
+        mmap of the file, in which case the spans are byte offsets. Every
+        token is ASCII, so the bytes of an ASCII compatible encoding such as
+        UTF-8 give the same sections as the text.
+    '''
+    def __init__(self, text):
+        self.text = text
+
+    def tokenize(self):
+        '''
+        Returns the list of Section in the order they appear in the text.
+        Sections that are never closed are dropped.
+        '''
+        text = self.text
+        is_bytes = not isinstance(text, str)
+        if is_bytes:
+            text_pattern, open_brace, close_brace = get_pattern("rd_token_bytes"), b"{", b"}"
+            r_like_pattern = get_pattern("rd_token_r_like_bytes")
+        else:
+            text_pattern, open_brace, close_brace = get_pattern("rd_token"), "{", "}"
+            r_like_pattern = get_pattern("rd_token_r_like")
+        sections = []
+        depth = 0
+        # Depth of the brace opening the R-like text being read, if any
+        r_like_depth = None
+        # End of the R-like macro, e.g. \code, whose brace may come next
+        r_like_macro_end = None
+
+        # The section being read as [name, start, items, methods]
+        section = None
+        # Macro whose brace arguments are being collected as
+        # [name, depth, end of the last token, argument spans]
+        macro = None
+        # Start of the macro argument that is currently open
+        argument_start = None
+        # Method waiting for the end of its usage
+        method = None
+
+        text_search, r_like_search = text_pattern.search, r_like_pattern.search
+        end = 0
+        while True:
+            match = (text_search if r_like_depth is None else r_like_search)(text, end)
+            if match is None:
+                break
+            token = match.group()
+            position = match.start()
+            end = match.end()
+            if match.lastindex == 2:
+                # A string of R-like text
+                continue
+            if match.lastindex == 1 and r_like_depth is None:
+                name = match.group(1)
+                if (name.decode("ascii") if is_bytes else name) in R_LIKE_MACROS:
+                    r_like_macro_end = end
+
+            if token == open_brace:
+                if r_like_macro_end == position:
+                    r_like_depth = depth + 1
+                r_like_macro_end = None
+                if macro is not None and argument_start is None:
+                    if macro[1] == depth and not text[macro[2]:position].strip():
+                        argument_start = position + 1
+                    else:
+                        macro = None
+                depth += 1
+                if depth == 1 and macro is not None:
+                    # Top level macros only take one argument
+                    section = [macro[0], argument_start, [], []]
+                    if macro[0] in R_LIKE_SECTIONS:
+                        r_like_depth = 1
+                    macro = None
+                    argument_start = None
+
+            elif token == close_brace:
+                if depth == 0:
+                    # Stray closing brace outside of any category
+                    continue
+                depth -= 1
+                if r_like_depth is not None and depth < r_like_depth:
+                    r_like_depth = None
+                if depth == 0:
+                    if section is not None:
+                        if method is not None:
+                            section[3].append(Method(*method, position))
+                            method = None
+                        sections.append(Section(section[0], section[1], position,
+                                                section[2], section[3]))
+                    section = None
+                    macro = None
+                    argument_start = None
+                elif argument_start is not None and depth == macro[1]:
+                    macro[3].append((argument_start, position))
+                    macro[2] = position + 1
+                    argument_start = None
+                    if len(macro[3]) == 2:
+                        (name_start, name_end), (start, end) = macro[3]
+                        if macro[0] == "item":
+                            section[2].append(Item(name_start, name_end, start, end))
+                        else:
+                            method = (name_start, name_end, start, end, position + 1)
+                        macro = None
+
+            elif match.group(1) is not None and argument_start is None:
+                # Only top level categories and the subcategories directly
+                # inside them are of interest.
+                name = match.group(1)
+                if is_bytes:
+                    name = name.decode("ascii")
+                if depth == 0 or (depth == 1 and section is not None
+                                  and name in SUBCATEGORY_MACROS):
+                    if name == "method" and method is not None:
+                        section[3].append(Method(*method, position))
+                        method = None
+                    macro = [name, depth, match.end(), []]
+                else:
+                    macro = None
+
+        return sections
@@ -1,23 +1,93 @@
-import re
+import codecs
+import locale
+import mmap
+import os
+from array import array
+from itertools import chain
+
+from src.profiler import profiler
+from src.rd_lexer import RDLexer
+
+# Bump whenever a change to the parser changes RDReader.data, so that the
+# entries of the ParseCache made by the previous parser are ignored.
+PARSER_VERSION = "3"
+
+# Categories that are read from the file.
+# Single line categories e.g., \name{...}
+SINGLELINE_CATEGORIES = ["name", "alias", "title", "format", "keyword", "doctype"]
+# Multiline categories e.g., \arguments{
+# ...
+# }
+MULTILINE_CATEGORIES = ["usage", "arguments", "value", "description", "details",
+                        "examples"]
+CATEGORIES = SINGLELINE_CATEGORIES + MULTILINE_CATEGORIES
+# The names read from the files are replaced by these ones when used as keys,
+# so that every RDReader.data shares the same key strings
+CATEGORY_KEYS = {name: name for name in CATEGORIES}
+# Categories used by RSTBuilder and RDSummary, the only ones decoded from the
+# bytes of a large file
+RENDERED_CATEGORIES = frozenset(["name", "alias", "title", "usage", "arguments", "value",
+                                 "description", "details"])
+
+# Files from this size on are mapped in memory and scanned as bytes, so that
+# the categories that are never rendered, e.g., megabytes of examples, are
+# neither decoded nor copied
+LARGE_FILE_SIZE = 1024 * 1024
 
 # Helper classes to sort the different types categories.
+# They only keep (start, end) spans into the content of the file, which is
+# shared by all the categories of a file, and copy the text out when it is
+# accessed.
 
 class StringCategory:
     # The general class where the contents of the category only contains a string
-    def __init__(self, string):
-        self.string = string
+    __slots__ = ("source", "start", "end")
+
+    def __init__(self, source, start=0, end=None):
+        self.source = source
+        self.start = start
+        self.end = len(source) if end is None else end
+
+    @property
+    def string(self):
+        if self.start == 0 and self.end == len(self.source):
+            return self.source
+        return self.source[self.start:self.end]
 
 class ItemCategory:
     # The category contains a list of \items{}
-    def __init__(self, items):
-        self.items = items
+    __slots__ = ("source", "spans")
+
+    def __init__(self, source, spans):
+        # spans: [RDLexer Item], kept flattened in an array of offsets
+        self.source = source
+        self.spans = array("l", chain.from_iterable(spans))
+
+    @property
+    def items(self):
+        source, spans = self.source, self.spans
+        items = {}
+        for i in range(0, len(spans), 4):
+            # A repeated argument keeps its first description
+            items.setdefault(source[spans[i]:spans[i + 1]],
+                             source[spans[i + 2]:spans[i + 3]])
+        return items
 
 class MethodCategory:
-    # The category contains a list of \methods{}
-    def __init__(self, methods):
-        key = next(iter(methods))
-        value = methods[key]
-        self.methods = (key, value)
+    # The category contains a list of \methods{}, only the first method is used
+    __slots__ = ("source", "span")
+
+    def __init__(self, source, spans):
+        # spans: [RDLexer Method], a repeated method keeps its last usage
+        name = source[spans[0].name_start:spans[0].name_end]
+        self.source = source
+        self.span = array("l", [span for span in spans
+                                if source[span.name_start:span.name_end] == name][-1])
+
+    @property
+    def methods(self):
+        source, span = self.source, self.span
+        return (source[span[0]:span[1]], (source[span[2]:span[3]], source[span[4]:span[5]]))
 
     def get_value(self):
         key, value = self.methods
@@ -27,6 +97,78 @@ class MethodCategory:
         '''.format(key=key, value1=value1, value2=value2)
         return output_value
         
+def get_function_name(filename):
+    '''
+    Returns the name a toctree uses to refer to an Rd file, i.e. its basename
+    without the extension.
+    '''
+    return os.path.basename(filename).replace(".Rd", "")
+
+def is_large_file(size):
+    '''
+    Returns True if an Rd file of size bytes is scanned as bytes rather than
+    decoded whole. The bytes are only scanned when the files are read as
+    UTF-8, the default encoding of open(), whose bytes give the same tokens
+    as the text.
+    '''
+    return size >= LARGE_FILE_SIZE and \
+        codecs.lookup(locale.getpreferredencoding(False)).name == "utf-8"
+
+def get_rendered_text(buffer):
+    '''
+    Returns the text of the RENDERED_CATEGORIES of the bytes of an Rd file,
+    e.g., an mmap of the file, as an Rd text of its own. The boundaries of
+    the categories are found over the raw bytes and only the rendered ones
+    are decoded, with their line endings translated as open() does, so that
+    parsing the text gives the same categories as parsing the whole file.
+    '''
+    parts = []
+    for section in RDLexer(buffer).tokenize():
+        if section.name in RENDERED_CATEGORIES:
+            text = buffer[section.start:section.end].decode("utf-8")
+            if "\r" in text:
+                text = text.replace("\r\n", "\n").replace("\r", "\n")
+            parts.append("\\{}{{{}}}\n".format(section.name, text))
+    return "".join(parts)
+
+class RDSummary:
+    '''
+    RDSummary keeps the part of an RDReader that the toctree pages use, i.e.,
+    the filename, the title and the alias. It is small and cheap to send
+    between processes.
+
+    Parameter:
+    ----------
+    filename: (str)
+        Filename of the R Markdown file
+
+    title: (str)
+        Title of the R Markdown file, None if it has no title
+
+    alias: (str)
+        Alias of the R Markdown file, None if it has no alias
+
+    arguments: (tuple)
+        Names of the arguments of the R Markdown file
+
+    source: (tuple)
+        (path, line) of the source code the function is defined in, None if
+        the details do not say
+
+    error: (str)
+        Why the file was skipped instead of converted, None if it was converted
+    '''
+    __slots__ = ("filename", "title", "alias", "arguments", "source", "error")
+
+    def __init__(self, filename, title=None, alias=None, arguments=(), source=None,
+                 error=None):
+        self.filename = filename
+        self.title = title
+        self.alias = alias
+        self.arguments = arguments
+        self.source = source
+        self.error = error
+
 class RDReader:
     '''
     RDReader reads an R Markdown file and saves the information into memory.
@@ -45,117 +187,124 @@ class RDReader:
     ----------
     filename: (str)
         Filename of the R Markdown file
+
+    cache: (ParseCache)
+        Optional cache consulted before reading and parsing the file
+
+    file_content: (str)
+        Content of the file if it was already read, e.g., by the reader
+        threads of ManReader, so that it is not read again. It can also be
+        the bytes of the file, of which only the rendered categories are
+        decoded.
+
+    Files of at least LARGE_FILE_SIZE bytes are mapped in memory rather than
+    read, and only their RENDERED_CATEGORIES are decoded and parsed.
     '''
-    def __init__(self, filename):
+    def __init__(self, filename, cache=None, file_content=None):
         self.filename = filename
-        file_content = self._read_file(filename)
-        self.data = self.parse_file(file_content)
+        self.data = None
+        if cache is not None:
+            with profiler.timer("cache"):
+                self.data = cache.get(filename)
+        self.from_cache = self.data is not None
+        if self.data is None:
+            if file_content is None:
+                with profiler.timer("read"):
+                    file_content = self._read_file(filename)
+            try:
+                with profiler.timer("parse"):
+                    self.data = self.parse_file(file_content)
+                if cache is not None:
+                    with profiler.timer("cache"):
+                        cache.put(filename, file_content, self.data)
+            finally:
+                if isinstance(file_content, mmap.mmap):
+                    file_content.close()
+
+    @classmethod
+    def from_text(cls, file_content, filename=""):
+        '''
+        Returns the RDReader of the content of an Rd file, without reading or
+        caching any file.
+        '''
+        rd_reader = cls.__new__(cls)
+        rd_reader.filename = filename
+        rd_reader.from_cache = False
+        with profiler.timer("parse"):
+            rd_reader.data = rd_reader.parse_file(file_content)
+        return rd_reader
 
     def parse_file(self, file_content):
         '''
-        Iterates through content of the file and parses each category.
+        Tokenizes the content of the file in a single pass and parses each
+        category. The bytes of a file are first reduced to the text of its
+        rendered categories.
         '''
+        if not isinstance(file_content, str):
+            file_content = get_rendered_text(file_content)
         output = {}
-        # Single line category
-        singleline_categories = ["name", "alias", "title", "format",
-                                "keyword", "doctype"]
-        singleline_category_search_string = r"\\(.*?){(.*?)}$"        
-        categories = re.findall(singleline_category_search_string,
-                          file_content, re.DOTALL|re.MULTILINE)
-
-        for category_string in categories:
-            key, value = self._parse_category(category_string)
-            if key in singleline_categories:
-                output[key] = value
-            
-        # Multiline categories
-        # Note that multiline categories end with "^}$"
-        multiline_categories = ["usage", "arguments", "value",
-                                "description", "details", "examples"]
-        
-        multiline_category_search_string = r"^\\([a-z]*?){$(.*?)^}"
-        categories = re.findall(multiline_category_search_string,
-                          file_content, re.DOTALL|re.MULTILINE)
-        for category_string in categories:
-            key, value = self._parse_category(category_string)
-            if key in multiline_categories:
-                output[key] = value
-
+        for section in RDLexer(file_content).tokenize():
+            if section.name in CATEGORY_KEYS:
+                output[CATEGORY_KEYS[section.name]] = self._parse_category(file_content,
+                                                                           section)
         return output
 
+    def get_summary(self):
+        '''
+        Returns the RDSummary of the file.
+        '''
+        title = self.data["title"].string if "title" in self.data else None
+        alias = self.data["alias"].string if "alias" in self.data else None
+        arguments = tuple(self.data["arguments"].items) \
+            if isinstance(self.data.get("arguments"), ItemCategory) else ()
+        return RDSummary(self.filename, title, alias, arguments, self.get_source())
+
+    def get_source(self):
+        '''
+        Returns the (path, line) of the "Defined in path:line" line ending the
+        details, None if there is none.
+        '''
+        if "details" in self.data:
+            details_string = self.data["details"].string
+            defined_in_string = details_string.split("\n")[-2]
+            if "Defined in" in defined_in_string:
+                path = defined_in_string.split(" ")[-1]
+                path, line = path.split(":")
+                return path, line
+        return None
+
     def _read_file(self, filename):
         '''
-        Helper function to read the contents of the file
+        Helper function to read the contents of the file. Returns a read
+        only mmap of the file if it is large and can be scanned as bytes.
         '''
+        if is_large_file(os.path.getsize(filename)):
+            with open(filename, 'rb') as rd_file:
+                return mmap.mmap(rd_file.fileno(), 0, access=mmap.ACCESS_READ)
         with open(filename, 'r') as rd_file:
             file_content = rd_file.read()
         return file_content
 
-    def _parse_category(self, category_string):
+    def _parse_category(self, file_content, section):
         '''
         Each category can be in 1 of 2 forms: 1) string, 2) A list of 
         categories i.e., [\(.*){...}] * N.
         
         Parameter:
         ----------
-        category: (str)
-            The parsed category
-        '''
-        category_name, content = category_string
-
-        output_class = StringCategory(content)
+        file_content: (str)
+            Content of the file the section was read from
 
-        # Check if the category contains methods
-        method_search_string = r"\\method{(.*?)}{(.*)}(.*)$"
-        methods = re.findall(method_search_string, content,
-                             re.DOTALL|re.MULTILINE)
-        if len(methods) > 0:
-            output = {}
-            for method in methods:
-                name, model, usage = method
-                output[name] = (model, usage)
-            output_class = MethodCategory(output)
-                
+        section: (Section)
+            The category as returned by the RDLexer
+        '''
         # Check if the category contains items
         # (which are the argument within the "argument" section)
-        items_search_string = r"\\item{([a-zA-Z0-9_\\.]*?)}"
-        items = re.findall(items_search_string, content,
-                                     re.DOTALL)
-            
-        if len(items) > 0:
-            output = {}
-            for item in items:
-                # Find the description of the argument.
-                # i.e., the ones within {}
-                start_index = content.find(item) + len(item)
-                start, end = self.find_closed_parenthesis(content, start_index)
-                if end:
-                    description = content[start:end]
-                else:
-                    description = content[start:]
-                output[item] = description
-            
-            output_class = ItemCategory(output)
-                
-        return category_name, output_class 
-        
+        if len(section.items) > 0:
+            return ItemCategory(file_content, section.items)
 
-    def find_closed_parenthesis(self, content, start_index):
-        '''
-        Helper function to find the first closed parenthesis.
-        '''
-        start_index = content.find('{', start_index)
-        end_index = None
-        counter = 0
-        for index, letter in enumerate(content[start_index:]):
-            if letter == '{':
-                counter += 1
-            if letter == '}':
-                counter -= 1
-            if counter == 0:
-                end_index = index
-                break
-        if end_index:
-            return start_index + 1, start_index + end_index
-        else:
-            return start_index + 1, None
+        # Check if the category contains methods
+        if len(section.methods) > 0:
+            return MethodCategory(file_content, section.methods)
+
+        return StringCategory(file_content, section.start, section.end)
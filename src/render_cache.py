@@ -0,0 +1,76 @@
+from collections import OrderedDict
+
+class RenderCache:
+    '''
+    RenderCache keeps the RST fragments rendered last, e.g., the argument
+    tables, which are identical across many of the generated Rd files.
+    Each kind of fragment is a bounded LRU mapping the inputs of the
+    fragment to its RST, and counts its hits and misses.
+
+    Usage:
+        table = render_cache.get("arguments", tuple(items.items()),
+                                 lambda: grid_table(rows, headers))
+
+    Parameter:
+    ----------
+    max_size: (int)
+        Maximum number of fragments kept for each kind, 0 disables the cache
+    '''
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.fragments = {}
+        # {kind: [hits, misses]}
+        self.stats = {}
+
+    def get(self, kind, key, render):
+        '''
+        Returns the fragment of the given kind for key, calling render() to
+        build it if it is not in the cache.
+        '''
+        fragments = self.fragments.setdefault(kind, OrderedDict())
+        stats = self.stats.setdefault(kind, [0, 0])
+        if key in fragments:
+            fragments.move_to_end(key)
+            stats[0] += 1
+            return fragments[key]
+        stats[1] += 1
+        fragment = render()
+        if self.max_size > 0:
+            fragments[key] = fragment
+            if len(fragments) > self.max_size:
+                fragments.popitem(last=False)
+        return fragment
+
+    def clear(self):
+        self.fragments = {}
+        self.stats = {}
+
+    def pop_stats(self):
+        '''
+        Remove and return the hits and misses counted since the last call,
+        used to send the statistics of the worker processes back to the main one.
+        '''
+        stats, self.stats = self.stats, {}
+        return stats
+
+def add_stats(total, stats):
+    '''
+    Adds the {kind: [hits, misses]} of stats to total.
+    '''
+    for kind, (hits, misses) in stats.items():
+        total_stats = total.setdefault(kind, [0, 0])
+        total_stats[0] += hits
+        total_stats[1] += misses
+
+def format_stats(stats):
+    '''
+    Returns the hit rate of each kind of fragment e.g.,
+    "Render cache: arguments 812/1000 hits (81.2%), value 990/1000 hits (99.0%)"
+    '''
+    rates = ["{} {}/{} hits ({:.1f}%)".format(kind, hits, hits + misses,
+                                              100.0 * hits / max(1, hits + misses))
+             for kind, (hits, misses) in sorted(stats.items())]
+    return "Render cache: " + (", ".join(rates) if rates else "no fragments rendered")
+
+# RenderCache shared by the whole process
+render_cache = RenderCache()
@@ -0,0 +1,177 @@
+import json
+import os
+
+from src.profiler import profiler
+from src.rd_reader import ItemCategory, MethodCategory
+from src.rst_builder import RSTBuilder
+
+# Formats written when none are given
+DEFAULT_FORMATS = ("rst",)
+
+def get_page_data(rd_reader, url=""):
+    '''
+    Returns the content of the page of an RDReader as plain values, the
+    common ground of the renderers other than RST:
+        - "name", "title", "alias", "description", "details" and "value" as
+          text, the description being empty when it repeats the title and the
+          details without their "Defined in" line
+        - "usage" as the R code of the usage
+        - "arguments" as a list of [name, description]
+        - "link" as the URL of the source code, None if the details do not
+          say where the function is defined
+    '''
+    data = rd_reader.data
+
+    def get_string(key):
+        return data[key].string if key in data else ""
+
+    title = get_string("title")
+    description = get_string("description")
+    if description.replace("\n", "") == title:
+        description = ""
+    details = get_string("details")
+    if "Defined in" in details:
+        details = "\n".join(details.split("\n")[:-2])
+
+    usage = data.get("usage")
+    if isinstance(usage, MethodCategory):
+        key, (model, arguments) = usage.methods
+        usage = "{}.{}{}".format(key, model, arguments)
+    else:
+        usage = usage.string if usage is not None else ""
+
+    arguments = data.get("arguments")
+    arguments = [[name, description] for name, description in arguments.items.items()] \
+        if isinstance(arguments, ItemCategory) else []
+
+    source = rd_reader.get_source()
+    link = "{}{}#{}".format(url or "", *source) if source else None
+    return {"name": get_string("name"), "title": title, "alias": get_string("alias"),
+            "description": description.strip("\n"), "details": details.strip("\n"),
+            "usage": usage.strip("\n"), "arguments": arguments,
+            "value": get_string("value").strip("\n"), "link": link}
+
+class Renderer:
+    '''
+    Renderer turns a parsed RDReader into the page of one output format, so
+    that a file parsed once can be rendered in several formats. Subclasses
+    set the format, i.e. the name given to --formats, and the extension of
+    their pages, and implement render.
+    '''
+    format = None
+    extension = None
+
+    def get_output_filename(self, rd_filename):
+        '''
+        Returns the name of the page built from an Rd file.
+        '''
+        return os.path.basename(rd_filename).replace(".Rd", self.extension)
+
+    def render(self, rd_reader, url=""):
+        '''
+        Returns the page of the RDReader as a string.
+        '''
+        raise NotImplementedError
+
+class RSTRenderer(Renderer):
+    '''
+    Sphinx RST pages, built by RSTBuilder.
+    '''
+    format = "rst"
+    extension = ".rst"
+
+    def render(self, rd_reader, url=""):
+        return RSTBuilder(rd_reader, url).rst_string
+
+class MarkdownRenderer(Renderer):
+    '''
+    MyST Markdown pages, with the sections of the RST pages. The details
+    are kept as they are, their indented examples being code blocks in
+    Markdown too.
+    '''
+    format = "md"
+    extension = ".md"
+
+    def render(self, rd_reader, url=""):
+        page = get_page_data(rd_reader, url)
+        lines = ["({})=".format(page["name"]), "# `{}`".format(page["name"]), "",
+                 "## Description", "", page["title"], ""]
+        for key in ("description", "details"):
+            if page[key]:
+                lines += [page[key], ""]
+        if page["usage"]:
+            lines += ["## Usage", "", "```r", page["usage"], "```", ""]
+        if page["arguments"]:
+            lines += ["## Arguments", "", "| Argument | Description |", "| --- | --- |"]
+            lines += ["| `{}` | {} |".format(name, self.format_cell(description))
+                      for name, description in page["arguments"]]
+            lines.append("")
+        if page["value"]:
+            first_word, _, remaining_words = page["value"].partition(" ")
+            lines += ["## Value", "", "`{}` {}".format(first_word.replace("\n", ""),
+                                                        remaining_words), ""]
+        if page["link"]:
+            lines += ["Link to Source Code: {}".format(page["link"]), ""]
+        return "\n".join(lines)
+
+    @staticmethod
+    def format_cell(text):
+        '''
+        Returns text on a single line, with its pipes escaped, for a table cell.
+        '''
+        return " ".join(text.split()).replace("|", "\\|")
+
+class JSONRenderer(Renderer):
+    '''
+    JSON documents of the values of get_page_data, e.g., for the help of an
+    IDE.
+    '''
+    format = "json"
+    extension = ".json"
+
+    def render(self, rd_reader, url=""):
+        return json.dumps(get_page_data(rd_reader, url), indent=1, sort_keys=True) + "\n"
+
+RENDERERS = {renderer.format: renderer
+             for renderer in (RSTRenderer(), MarkdownRenderer(), JSONRenderer())}
+
+def parse_formats(formats):
+    '''
+    Returns the formats of a comma separated list, e.g., "rst,md,json", in
+    order and without duplicates. Raises a ValueError for an unknown format.
+    '''
+    parsed = []
+    for output_format in formats.split(","):
+        output_format = output_format.strip()
+        if output_format not in RENDERERS:
+            raise ValueError("Unknown format {!r}, the formats are {}".format(
+                output_format, ", ".join(RENDERERS)))
+        if output_format not in parsed:
+            parsed.append(output_format)
+    return tuple(parsed)
+
+def get_output_filenames(rd_filename, formats=DEFAULT_FORMATS):
+    '''
+    Returns the names of the pages built from an Rd file in each format.
+    '''
+    return [RENDERERS[output_format].get_output_filename(rd_filename)
+            for output_format in formats]
+
+def render_pages(rd_reader, url="", formats=DEFAULT_FORMATS):
+    '''
+    Renders the parsed RDReader in each format and returns the
+    (output filename, page) of each. The RDReader is parsed once whatever
+    the number of formats.
+    '''
+    pages = []
+    with profiler.timer("render"):
+        for output_format in formats:
+            renderer = RENDERERS[output_format]
+            if output_format == "rst":
+                # RSTBuilder times its own sections
+                page = renderer.render(rd_reader, url)
+            else:
+                with profiler.timer("render." + output_format):
+                    page = renderer.render(rd_reader, url)
+            pages.append((renderer.get_output_filename(rd_reader.filename), page))
+    return pages
@@ -1,36 +1,61 @@
 import os
 import textwrap
 
-from tabulate import tabulate
+from src.file_writer import write_file
+from src.profiler import profiler, timed
 from src.rd_reader import StringCategory, ItemCategory, MethodCategory
+from src.render_cache import render_cache
+from src.rst_table import grid_table
+from src.rst_template import RSTTemplate, empty_blank_lines
+
+# Layout of the RST page of an Rd file, compiled once
+RST_TEMPLATE = RSTTemplate('''\
+    .. raw:: html
+
+
+    ``{name}``
+    ============================================
+
+    Description
+    ----------------------
+
+    {title}
+    {description}
+    {details}
+
+    {usage}
+
+    Arguments
+    ------------------
+
+    {arguments}
+
+    {value}
+
+    {link}
+
+    .. disqus::
+            :disqus_identifier: {alias}
+
+    ''')
+
+def get_output_filename(rd_filename):
+    '''
+    Returns the name of the RST file built from an Rd file.
+    '''
+    return os.path.basename(rd_filename).replace(".Rd", ".rst")
 
 class RSTBuilder:
     '''
     RSTBuilder takes an RDReader to build an RST file from an RD file.
     '''
     def __init__(self, rd_reader, url=""):
-        self.url = url
+        # --url is optional, None links to the path alone
+        self.url = url or ""
         self.rd_reader = rd_reader
         self.rst_string = self.get_rst()
 
-    def dedent(func):
-        '''
-        Normalises all the printed string to fit the docstring indentation
-        so textwrap can remove all unnecessary indentations.
-        e.g.,
-        
-        """
-        text text 
-        {value}
-        """
-        if value contains \n, the indentation must match "text text"
-        
-        '''
-        def add_indentation_to_new_line(*args, **kwargs):
-            return func(*args, **kwargs).replace("\n", "\n        ")
-        return add_indentation_to_new_line
-            
-    @dedent
+    @timed("render.default")
     def get_default(self, key):
         '''
         The default method to get the string from  "name", "title", and "alias" string
@@ -38,7 +63,7 @@ class RSTBuilder:
         '''
         return self.rd_reader.data[key].string
 
-    @dedent
+    @timed("render.details")
     def get_details(self):
         '''
         The method to get details category.
@@ -58,7 +83,7 @@ class RSTBuilder:
             
         return ""
 
-    @dedent
+    @timed("render.description")
     def get_description(self):
         '''
         Method to get the description.
@@ -71,28 +96,32 @@ class RSTBuilder:
         else:
             return description
 
-    @dedent
+    @timed("render.arguments")
     def get_argument(self):
         '''
         Method to get the arguments. This generates a table that is in a markdown table
-        format with tabulate.
+        format with grid_table. Files sharing the same arguments share the same table
+        from the render_cache.
         '''
         if "arguments" in self.rd_reader.data:
             headers = ["Argument", "Description"]
-            table = []
             argument_items = self.rd_reader.data["arguments"].items
 
             if len(argument_items) == 0:
                 return ""
-            
-            for argument in argument_items:
-                description = argument_items[argument]
-                table.append(["``{}``".format(argument), description])
-            return tabulate(table, headers, tablefmt="grid")
+
+            def get_table():
+                table = []
+                for argument in argument_items:
+                    description = argument_items[argument]
+                    table.append(["``{}``".format(argument), description])
+                return grid_table(table, headers)
+
+            return render_cache.get("arguments", tuple(argument_items.items()), get_table)
         else:
             return ""
 
-    @dedent
+    @timed("render.usage")
     def get_usage(self):
         '''
         Method to get the sample usages.
@@ -106,54 +135,64 @@ class RSTBuilder:
                 usage_value = self.rd_reader.data["usage"].string
 
             usage_value = usage_value.replace("\n", "") # To normalise the indentation
-            
-            usage_string = '''
-            Usage
-            ----------
-            .. code:: r
-            
-            \t{usage} 
-            '''.format(usage=usage_value)
-            return textwrap.dedent(usage_string)
+            return render_cache.get("usage", usage_value, lambda: self.format_usage(usage_value))
         else:
             return ""
 
-    @dedent
+    @staticmethod
+    def format_usage(usage_value):
+        # The code line is emptied when the usage is blank, as textwrap.dedent did
+        code = "\t{} ".format(usage_value) if usage_value.strip(" \t") else ""
+        return "\nUsage\n----------\n.. code:: r\n\n" + code + "\n"
+
+    @timed("render.value")
     def get_value(self):
         '''
         To get the value in the mark down file.
         '''
         if "value" in self.rd_reader.data:
-            # Put quotations around the first word in the value string
-            first_space = self.rd_reader.data["value"].string.find(" ")
-            first_word = self.rd_reader.data["value"].string[:first_space].replace("\n", "")
-            remaining_words = self.rd_reader.data["value"].string[first_space:]
-            value_string = '''
+            value = self.rd_reader.data["value"].string
+            return render_cache.get("value", value, lambda: self.format_value(value))
+        else:
+            return ""
+
+    @staticmethod
+    def format_value(value):
+        # Put quotations around the first word in the value string
+        first_space = value.find(" ")
+        first_word = value[:first_space].replace("\n", "")
+        remaining_words = value[first_space:]
+        value_string = "``{}`` {}".format(first_word, remaining_words)
+        if not any(line.strip(" \t") for line in value_string.split("\n")[1:]):
+            return "\nValue\n------------------\n" + empty_blank_lines(value_string) + "\n"
+
+        # The lines of the value are not indented like the template, the
+        # template keeps the indentation textwrap.dedent leaves in the output
+        value_string = '''
             Value
             ------------------
             ``{first_word}`` {remaining_words}
             '''.format(first_word=first_word, remaining_words=remaining_words)
-            return textwrap.dedent(value_string)
-        else:
-            return ""
+        return textwrap.dedent(value_string)
 
-    @dedent
+    @timed("render.link")
     def get_link(self):
         '''
         Parse the last string in the "details" section and make make it into a link to
         the mxnet source code.
         '''
-        if "details" in self.rd_reader.data:
-            details_string = self.rd_reader.data["details"].string
-            defined_in_string = details_string.split("\n")[-2]
-            if "Defined in" in defined_in_string:
-                path = defined_in_string.split(" ")[-1]
-                path, line = path.split(":")
-                link_string = '''
+        source = self.rd_reader.get_source()
+        if source is not None:
+            path, line = source
+            if "\n" not in self.url:
+                return "\nLink to Source Code: {url}{path}#{line}\n".format(
+                    url=self.url, path=path, line=line)
+            # Indented as before, textwrap.dedent keeps it when the url has lines
+            link_string = '''
                 Link to Source Code: {url}{path}#{line}
                 '''.format(url=self.url, path=path, line=line)
-                
-                return textwrap.dedent(link_string)
+
+            return textwrap.dedent(link_string)
         return ""
 
     def get_rst(self):
@@ -170,47 +209,18 @@ class RSTBuilder:
         value = self.get_value()
         link = self.get_link()
         alias = self.get_default("alias")
-        
-        rst_string = '''\
-        .. raw:: html
-
-
-        ``{name}``
-        ============================================
-        
-        Description
-        ----------------------
-
-        {title}
-        {description}
-        {details}
-        
-        {usage}
-
-        Arguments
-        ------------------
-
-        {arguments}
-
-        {value}
-
-        {link}
-        
-        .. disqus::
-                :disqus_identifier: {alias}
-
-        '''.format(name=name, title=title, description=description, details=details,
-                   usage=usage, arguments=arguments, value=value, link=link, alias=alias)
 
-        rst_string_dedent = textwrap.dedent(rst_string)
-        return rst_string_dedent
+        with profiler.timer("render.template"):
+            rst_string = RST_TEMPLATE.render(
+                name=name, title=title, description=description, details=details,
+                usage=usage, arguments=arguments, value=value, link=link, alias=alias)
+        return rst_string
 
     def write_rst_file(self, directory, filename=None):
         '''
         Function to write the file into storage.
         '''
         if not filename:
-            filename = os.path.basename(self.rd_reader.filename).replace(".Rd", ".rst")
+            filename = get_output_filename(self.rd_reader.filename)
 
-        with open(os.path.join(directory, filename), 'w') as f:
-            f.write(self.rst_string)
+        write_file(os.path.join(directory, filename), self.rst_string)
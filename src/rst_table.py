@@ -0,0 +1,142 @@
+from src.patterns import get_pattern
+
+def grid_table(rows, headers=()):
+    '''
+    Returns the table as tabulate(rows, headers, tablefmt="grid") does.
+    e.g.,
+    +------------+---------------+
+    | Argument   | Description   |
+    +============+===============+
+    | ``data``   | The input.    |
+    +------------+---------------+
+    '''
+    lines = _get_lines(rows, headers)
+    if lines is None:
+        return _tabulate(rows, headers, "grid")
+    header_lines, rows_lines, widths = lines
+    if not rows_lines:
+        return ""
+
+    def border(fill):
+        return "+" + "+".join(fill * (width + 2) for width in widths) + "+"
+
+    def row(cells_lines):
+        return ["| " + " | ".join(line.ljust(width) for line, width in zip(row_lines, widths))
+                + " |" for row_lines in cells_lines]
+
+    table = [border("-")]
+    if header_lines:
+        table += row(header_lines)
+        table.append(border("="))
+    for index, cells_lines in enumerate(rows_lines):
+        if index > 0:
+            table.append(border("-"))
+        table += row(cells_lines)
+    table.append(border("-"))
+    return "\n".join(table)
+
+def rst_table(rows, headers=()):
+    '''
+    Returns the table as tabulate(rows, headers, tablefmt="rst") does.
+    e.g.,
+    ====================  ==========
+    :doc: `abs <./abs>`   Abs value
+    ====================  ==========
+    '''
+    lines = _get_lines(rows, headers, escape_first_column=True)
+    if lines is None:
+        return _tabulate(rows, headers, "rst")
+    header_lines, rows_lines, widths = lines
+    if not rows_lines:
+        return ""
+
+    border = "  ".join("=" * width for width in widths).rstrip()
+
+    def row(cells_lines):
+        return ["  ".join(line.ljust(width) for line, width in zip(row_lines, widths)).rstrip()
+                for row_lines in cells_lines]
+
+    table = [border]
+    if header_lines:
+        table += row(header_lines)
+        table.append(border)
+    for cells_lines in rows_lines:
+        table += row(cells_lines)
+    table.append(border)
+    return "\n".join(table)
+
+def _get_lines(rows, headers, escape_first_column=False):
+    '''
+    Returns the lines of the headers, the lines of each row and the width of
+    each column, every row being a list of lines of cells padded to the same
+    number of lines. Returns None for the tables tabulate formats differently
+    from text, i.e., numeric columns, ragged rows, wide or control characters.
+    '''
+    if not rows:
+        # An empty table is empty, unless tabulate has headers to print
+        return None if headers else ([], [], [])
+    n_columns = len(headers) if headers else len(rows[0])
+    if n_columns == 0:
+        return None
+    unsupported_characters = get_pattern("table_unsupported_characters")
+
+    table = []
+    for row in rows:
+        if len(row) != n_columns:
+            return None
+        cells = list(row)
+        if escape_first_column and isinstance(cells[0], str) and not cells[0].strip():
+            # tabulate escapes the empty cells of the first column of RST tables
+            cells[0] = ".."
+        cells = ["" if cell is None else cell for cell in cells]
+        for cell in cells:
+            if not isinstance(cell, str) or unsupported_characters.search(cell):
+                return None
+        table.append(cells)
+
+    for header in headers:
+        if not isinstance(header, str) or unsupported_characters.search(header) \
+                or "\n" in header:
+            return None
+
+    for column in zip(*table):
+        # tabulate aligns numbers to the right, a column is only text if one of
+        # its cells is text or if all of them are empty
+        if any(column) and not any(_is_text(cell) for cell in column):
+            return None
+
+    # As soon as a cell has several lines, tabulate drops the rows made only
+    # of empty cells
+    multiline = any("\n" in cell for cells in table for cell in cells)
+    rows_lines = []
+    widths = [len(header) + 2 for header in headers] or [0] * n_columns
+    for cells in table:
+        cells_lines = []
+        for column, cell in enumerate(cells):
+            cell = cell.strip()
+            lines = cell.split("\n") if cell or not multiline else []
+            widths[column] = max([widths[column]] + [len(line) for line in lines])
+            cells_lines.append(lines)
+        n_lines = max(map(len, cells_lines))
+        rows_lines.append([[lines[i] if i < len(lines) else "" for lines in cells_lines]
+                           for i in range(n_lines)])
+    header_lines = [list(headers)] if headers else []
+    return header_lines, rows_lines, widths
+
+def _is_text(cell):
+    '''
+    Returns False for the cells tabulate may read as a bool or a number,
+    including blank cells, e.g., "\\n" is read as an int.
+    '''
+    if not cell.strip() or cell in ("True", "False"):
+        return False
+    try:
+        float(cell.replace(",", ""))
+    except ValueError:
+        return True
+    return False
+
+def _tabulate(rows, headers, tablefmt):
+    # Only imported for the few tables the native renderer leaves to tabulate
+    from tabulate import tabulate
+    return tabulate(rows, headers, tablefmt=tablefmt)
@@ -0,0 +1,74 @@
+import string
+import textwrap
+
+class RSTTemplate:
+    '''
+    RSTTemplate compiles the layout of a page once into its literal fragments
+    and {field} slots, so that a page is assembled with a single join instead
+    of formatting an indented literal and dedenting the whole page.
+
+    The output is the one of indenting every line of the values like the slot
+    they are in, formatting the layout and dedenting the page: the lines of
+    the values are kept as they are, except for the lines made only of spaces
+    and tabs, which textwrap.dedent empties.
+
+    Usage:
+        template = RSTTemplate(layout)
+        rst_string = template.render(name="mx.nd.abs", description="...")
+
+    Parameter:
+    ----------
+    layout: (str)
+        Layout of the page with str.format style {field} slots
+    '''
+    def __init__(self, layout):
+        layout = textwrap.dedent(layout)
+        # [literal, field, literal, field, ..., literal]
+        self.fragments = []
+        # (field, index of the slot in fragments, whether the first and last
+        # lines of the value are lines of their own in the page)
+        self.slots = []
+        literals = []
+        fields = []
+        for literal, field, _, _ in string.Formatter().parse(layout):
+            literals.append(literal)
+            if field is not None:
+                fields.append(field)
+        if len(literals) == len(fields):
+            literals.append("")
+
+        for i, field in enumerate(fields):
+            own_first_line = (i == 0 and literals[i] == "") or literals[i].endswith("\n")
+            own_last_line = literals[i + 1].startswith("\n") or \
+                (i == len(fields) - 1 and literals[i + 1] == "")
+            self.fragments.append(literals[i])
+            self.slots.append((field, len(self.fragments), own_first_line, own_last_line))
+            self.fragments.append(None)
+        self.fragments.append(literals[-1])
+
+    def render(self, **values):
+        '''
+        Returns the page with the given values in the slots.
+        '''
+        fragments = list(self.fragments)
+        for field, index, own_first_line, own_last_line in self.slots:
+            fragments[index] = empty_blank_lines(values[field], own_first_line,
+                                                 own_last_line)
+        return "".join(fragments)
+
+def empty_blank_lines(text, first_line=True, last_line=True):
+    '''
+    Empties the lines of text made only of spaces and tabs, except for the
+    first and last lines if first_line and last_line are False, i.e. if they
+    are part of a longer line.
+    '''
+    # Only the lines starting with a space or a tab can be blank
+    if not text.startswith((" ", "\t")) and "\n " not in text and "\n\t" not in text:
+        return text
+    lines = text.split("\n")
+    start = 0 if first_line else 1
+    end = len(lines) if last_line else len(lines) - 1
+    for i in range(start, end):
+        if lines[i] and not lines[i].strip(" \t"):
+            lines[i] = ""
+    return "\n".join(lines)
@@ -0,0 +1,128 @@
+import json
+
+from src.file_writer import iter_json, write_chunks
+from src.patterns import get_pattern
+
+# Written next to the RST files, e.g., to be copied with html_extra_path
+SEARCH_INDEX_FILENAME = "rd2sphinxrst-searchindex.json"
+
+# Bump whenever the format of the search index changes
+SEARCH_INDEX_VERSION = "1"
+
+# Fields of the inverted index
+FIELDS = ("name", "alias", "title", "argument")
+
+# Words of the titles too common to be searched for
+STOPWORDS = frozenset(["a", "an", "and", "as", "at", "be", "by", "for", "from", "in",
+                       "is", "it", "of", "on", "or", "the", "to", "with"])
+
+def get_terms(text, whole=True):
+    '''
+    Returns the terms of text: its lowercase words, and the whole lowercase
+    text if whole is True, e.g., "mx.nd.abs" gives "mx.nd.abs", "mx", "nd" and
+    "abs" so that both the full name and its parts are found.
+    '''
+    # Names are mostly lowercase already, they are kept rather than copied
+    if not text.islower():
+        text = text.lower()
+    terms = set(get_pattern("search_term").findall(text))
+    if whole and text.strip():
+        terms.add(text.strip())
+    return terms
+
+def get_search_index(index, url="", skipped=()):
+    '''
+    Returns the search and cross-reference index of the functions of a
+    FunctionIndex as a dict ready to be saved as JSON. Every function is an
+    id, the position of its name in "pages", and:
+        - "pages", "titles", "aliases" and "links" are columns giving the
+          page, title, alias and source code link of each id
+        - "functions" maps every name and alias to the id of its page
+        - "terms" is an inverted index mapping, for each of FIELDS, the terms
+          of the names, aliases, titles or argument names to the sorted ids
+          they are found in
+
+    Parameter:
+    ----------
+    index: (FunctionIndex)
+        Index of the converted functions
+
+    url: (str)
+        URL of the repository, prefix of the source code links
+
+    skipped: [str]
+        Rd files that were skipped, i.e. that have no page
+    '''
+    names = sorted(name for name, entry in index.entries.items()
+                   if entry.filename not in skipped)
+    functions = {}
+    terms = {field: {} for field in FIELDS}
+    titles, aliases, links = [], [], []
+    for i, name in enumerate(names):
+        entry = index[name]
+        titles.append(entry.title)
+        aliases.append(entry.alias)
+        links.append("{}{}#{}".format(url or "", *entry.source) if entry.source else None)
+        functions.setdefault(name, i)
+
+        name_terms = get_terms(name)
+        field_terms = {"name": name_terms, "alias": set(), "title": set(),
+                       "argument": set()}
+        if entry.alias:
+            functions.setdefault(entry.alias, i)
+            field_terms["alias"] = name_terms if entry.alias == name else get_terms(entry.alias)
+        if entry.title:
+            # The titles mostly mention the name, its terms are kept once
+            name_term_strings = {term: term for term in name_terms}
+            field_terms["title"] = {name_term_strings.get(term, term) for term in
+                                    get_terms(entry.title, whole=False) - STOPWORDS}
+        for argument in entry.arguments:
+            field_terms["argument"] |= get_terms(argument)
+        # Most terms are found in one function only: they all share the tuple
+        # of its id, turned into a list when the term is found again. Both
+        # are saved as the same JSON array
+        single = (i,)
+        for field, field_term_set in field_terms.items():
+            field_postings = terms[field]
+            for term in field_term_set:
+                postings = field_postings.get(term)
+                if postings is None:
+                    field_postings[term] = single
+                elif isinstance(postings, tuple):
+                    field_postings[term] = list(postings) + [i]
+                else:
+                    postings.append(i)
+
+    return {"version": SEARCH_INDEX_VERSION, "url": url or "", "pages": names,
+            "titles": titles, "aliases": aliases, "links": links,
+            "functions": functions, "terms": terms}
+
+def dump_search_index(search_index):
+    '''
+    Returns the search index as compact JSON. The keys are sorted so that the
+    same functions always give the same file.
+    '''
+    return json.dumps(search_index, sort_keys=True, separators=(",", ":"))
+
+def write_search_index(filename, search_index):
+    '''
+    Writes the search index to filename, unless it is unchanged, as the
+    same JSON as dump_search_index, written term by term rather than held
+    whole in memory.
+    '''
+    # The levels are the index, its "terms" and the terms of each field
+    return write_chunks(filename, iter_json(search_index, 3))
+
+def search(search_index, query, fields=FIELDS):
+    '''
+    Returns the pages of the functions matching every term of the query in
+    one of the fields, e.g., search(search_index, "nd abs"). A reference for
+    the clients of the search index.
+    '''
+    ids = None
+    for term in get_terms(query, whole=False) or [query.lower()]:
+        term_ids = set()
+        for field in fields:
+            term_ids.update(search_index["terms"][field].get(term, ()))
+        ids = term_ids if ids is None else ids & term_ids
+    return [search_index["pages"][i] for i in sorted(ids or ())]
@@ -0,0 +1,126 @@
+import json
+import os
+import socket
+import traceback
+
+from src.man_reader import ManReader
+from src.rd_reader import RDReader
+from src.rst_builder import RSTBuilder, get_output_filename
+from src.toctree_reader import MissingFunctionError
+
+class ConversionServer:
+    '''
+    ConversionServer keeps the converter loaded and answers conversion
+    requests sent as JSON lines, either on stdin/stdout or on a Unix socket.
+    Every request gets exactly one JSON line back.
+
+    Requests:
+        {"command": "convert", "rd_file": ..., "url": ..., "output_dir": ...}
+            Converts one Rd file. Returns {"rst": ...}, or writes the RST file
+            when output_dir is given and returns {"output": ...}
+        {"command": "build", "man_dir": ..., "toctree_dir": ..., "output_dir": ...,
+         "url": ..., "force": false}
+            Same as a run of Rd2SphinxRst.py, incremental through the manifest
+        {"command": "ping"}
+        {"command": "shutdown"}
+
+    Responses have "ok" set to true, or to false with the "error" message.
+    The "id" of the request, if any, is copied into the response.
+
+    Parameter:
+    ----------
+    jobs: (int)
+        Number of processes used by the build requests
+
+    cache_dir: (str)
+        Directory of the ParseCache used by the build requests
+    '''
+    def __init__(self, jobs=1, cache_dir=None):
+        self.jobs = jobs
+        self.cache_dir = cache_dir
+        self.running = True
+
+    def handle(self, request):
+        '''
+        Returns the response to a request.
+        '''
+        response = {"ok": True}
+        if "id" in request:
+            response["id"] = request["id"]
+        try:
+            command = request.get("command")
+            if command == "convert":
+                response.update(self.convert(request))
+            elif command == "build":
+                response.update(self.build(request))
+            elif command == "shutdown":
+                self.running = False
+            elif command != "ping":
+                raise ValueError("Unknown command: {}".format(command))
+        except MissingFunctionError as error:
+            response.update({"ok": False, "error": str(error)})
+        except Exception as error:
+            response.update({"ok": False, "error": "{}: {}".format(
+                type(error).__name__, error), "traceback": traceback.format_exc()})
+        return response
+
+    def convert(self, request):
+        rst = RSTBuilder(RDReader(request["rd_file"]), request.get("url", ""))
+        if not request.get("output_dir"):
+            return {"rst": rst.rst_string}
+        rst.write_rst_file(request["output_dir"])
+        return {"output": os.path.join(request["output_dir"],
+                                       get_output_filename(request["rd_file"]))}
+
+    def build(self, request):
+        mr = ManReader(request["man_dir"], jobs=self.jobs, cache_dir=self.cache_dir)
+        mr.write_rst(request["output_dir"], request["toctree_dir"],
+                     url=request.get("url", ""), force=request.get("force", False))
+        return {"skipped": mr.skipped}
+
+    def handle_line(self, line):
+        '''
+        Returns the response line to a request line.
+        '''
+        try:
+            request = json.loads(line)
+        except ValueError as error:
+            return json.dumps({"ok": False, "error": "Invalid JSON: {}".format(error)})
+        return json.dumps(self.handle(request))
+
+    def serve_stream(self, rfile, wfile):
+        '''
+        Answers the requests read from rfile until it is closed or a shutdown
+        request is received.
+        '''
+        for line in rfile:
+            if not line.strip():
+                continue
+            wfile.write(self.handle_line(line) + "\n")
+            wfile.flush()
+            if not self.running:
+                break
+
+    def serve_unix_socket(self, path):
+        '''
+        Listens on a Unix socket and serves the connections one at a time
+        until a shutdown request is received.
+        '''
+        if os.path.exists(path):
+            os.remove(path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen()
+        try:
+            while self.running:
+                connection, _ = server.accept()
+                try:
+                    with connection, connection.makefile('r') as rfile, \
+                            connection.makefile('w') as wfile:
+                        self.serve_stream(rfile, wfile)
+                except OSError:
+                    # The client went away, wait for the next one
+                    continue
+        finally:
+            server.close()
+            os.remove(path)
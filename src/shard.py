@@ -0,0 +1,217 @@
+import glob
+import hashlib
+import json
+import os
+
+from src.file_writer import write_file
+from src.function_index import FunctionIndex
+from src.manifest import CONVERTER_VERSION, Manifest, file_hash
+from src.profiler import profiler
+from src.rd_reader import get_function_name
+from src.search_index import SEARCH_INDEX_FILENAME, get_search_index, write_search_index
+from src.toctree_reader import TocTreeReader, check_missing_functions
+
+SHARD_FILENAME = ".rd2sphinxrst-shard-{}-of-{}.json"
+
+class ShardError(Exception):
+    '''
+    Raised when shard files cannot be merged, e.g., a shard is missing or an
+    RST file differs from the one the shard wrote.
+    '''
+
+def parse_shard(shard):
+    '''
+    Returns the (index, count) of a shard given as "i/N", with 1 <= i <= N.
+    '''
+    try:
+        index, count = (int(value) for value in shard.split("/"))
+    except ValueError:
+        raise ValueError("Shard must be i/N, e.g. 1/4: {}".format(shard))
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError("Shard must be i/N with 1 <= i <= N: {}".format(shard))
+    return index, count
+
+def get_shard(filename, count):
+    '''
+    Returns the shard, from 1 to count, of an Rd file. It only depends on the
+    basename of the file, so every node splits the files the same way
+    whatever the directory they are in.
+    '''
+    digest = hashlib.sha256(os.path.basename(filename).encode("utf-8")).hexdigest()
+    return int(digest, 16) % count + 1
+
+class ShardFile:
+    '''
+    ShardFile records what a shard converted, so that the toctree pages can be
+    written from the shards without parsing the Rd files again.
+
+    It is saved as JSON in the output directory of the shard and holds the
+    converter version, the URL, the shard and, for each Rd file of the
+    shard: the function name, the hash of its content, its title, its alias,
+    its argument names, its source code location and the hash of each of its
+    pages, e.g., its RST file.
+
+    Usage:
+        shard_file = ShardFile(1, 4, url)
+        shard_file.set_rd_file(rd_summary, digest, {output_filename: output_digest})
+        shard_file.save(output_path)
+
+    Parameter:
+    ----------
+    index: (int)
+        Shard, from 1 to count
+
+    count: (int)
+        Number of shards
+
+    url: (str)
+        URL of the repository used for the build
+    '''
+    def __init__(self, index, count, url=""):
+        self.index = index
+        self.count = count
+        self.url = url or ""
+        self.version = CONVERTER_VERSION
+        self.rd_files = {}
+
+    def get_filename(self):
+        return SHARD_FILENAME.format(self.index, self.count)
+
+    def set_rd_file(self, rd_summary, digest, outputs):
+        '''
+        Records a converted Rd file and the {page: hash} of its pages.
+        '''
+        filename = rd_summary.filename
+        self.rd_files[os.path.basename(filename)] = {
+            "name": get_function_name(filename), "hash": digest, "title": rd_summary.title,
+            "alias": rd_summary.alias, "arguments": list(rd_summary.arguments),
+            "source": list(rd_summary.source) if rd_summary.source else None,
+            "outputs": outputs}
+
+    def set_skipped_file(self, filename, error):
+        '''
+        Records an Rd file the shard skipped, see ManReader.skipped.
+        '''
+        self.rd_files[os.path.basename(filename)] = {
+            "name": get_function_name(filename), "skipped": error}
+
+    def save(self, directory):
+        '''
+        Write the shard file to the directory and return its path.
+        '''
+        shard = {"version": self.version, "url": self.url, "shard": self.index,
+                 "count": self.count, "rd_files": self.rd_files}
+        filename = os.path.join(directory, self.get_filename())
+        write_file(filename, json.dumps(shard, sort_keys=True, separators=(",", ":")))
+        return filename
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as f:
+            shard = json.load(f)
+        shard_file = cls(shard["shard"], shard["count"], shard["url"])
+        shard_file.version = shard["version"]
+        shard_file.rd_files = shard["rd_files"]
+        return shard_file
+
+def load_shards(shard_files):
+    '''
+    Loads the shard files and checks that they are a complete set of shards
+    of a single build. Returns the ShardFiles ordered by shard.
+    '''
+    if not shard_files:
+        raise ShardError("No shard files to merge")
+    shards = sorted((ShardFile.load(filename) for filename in shard_files),
+                    key=lambda shard: shard.index)
+    first = shards[0]
+    for shard in shards:
+        if (shard.version, shard.url, shard.count) != (first.version, first.url, first.count):
+            raise ShardError("Shards of different builds: shard {}/{} and shard {}/{} "
+                             "differ in converter version, URL or number of shards".format(
+                                 first.index, first.count, shard.index, shard.count))
+    if first.version != CONVERTER_VERSION:
+        raise ShardError("Shards written by converter version {}, this is version {}".format(
+            first.version, CONVERTER_VERSION))
+    indices = [shard.index for shard in shards]
+    if len(set(indices)) != len(indices):
+        raise ShardError("Duplicated shards: {}".format(indices))
+    missing = sorted(set(range(1, first.count + 1)) - set(indices))
+    if missing:
+        raise ShardError("Missing shards: {}".format(
+            ", ".join("{}/{}".format(index, first.count) for index in missing)))
+    return shards
+
+def merge_shards(shard_files, toctree_dir, output_path):
+    '''
+    Merge the shard files written by Rd2SphinxRst.py --shard i/N: checks
+    that every page, e.g., RST file, of the shards is in output_path, writes
+    the toctree pages and the search index from the titles, aliases,
+    arguments and source code locations recorded by the shards, and saves
+    the manifest. Nothing is parsed, and once the shard files of
+    output_path are removed the output directory holds the same files as a
+    build on a single node. Returns the
+    {Rd file: why it was skipped} of the files the shards skipped.
+
+    Usage:
+        merge_shards(glob.glob("doc/.rd2sphinxrst-shard-*.json"), toctree_dir, "doc")
+
+    Parameter:
+    ---------
+    shard_files: [str]
+        Shard files of every shard of the build
+
+    toctree_dir: str
+        Input directory of the toctree JSON files
+
+    output_path: str
+        Directory holding the RST files of every shard
+    '''
+    shards = load_shards(shard_files)
+    manifest = Manifest(output_path, shards[0].url)
+    manifest.clear()
+    index = FunctionIndex()
+    seen = set()
+    skipped = {}
+    problems = []
+    for shard in shards:
+        for basename, entry in sorted(shard.rd_files.items()):
+            if basename in seen:
+                problems.append("{}: in more than one shard".format(basename))
+                continue
+            seen.add(basename)
+            if "skipped" in entry:
+                # Listed without a title, as by a build on a single node
+                index.set(basename, None, None)
+                skipped[basename] = entry["skipped"]
+                continue
+            for output, output_digest in sorted(entry["outputs"].items()):
+                output_filename = os.path.join(output_path, output)
+                if not os.path.exists(output_filename):
+                    problems.append("{}: missing".format(output_filename))
+                elif file_hash(output_filename) != output_digest:
+                    problems.append("{}: differs from the file of shard {}/{}".format(
+                        output_filename, shard.index, shard.count))
+            index.set(basename, entry["title"], entry["alias"], entry["arguments"],
+                      entry["source"])
+            manifest.set_rd_file(basename, entry["hash"], index[get_function_name(basename)])
+    if problems:
+        raise ShardError("Cannot merge the shards:\n" + "\n".join(problems))
+
+    toctree_readers = {}
+    for toctree_file in sorted(glob.glob(os.path.join(toctree_dir, "*.json"))):
+        toctree_readers[toctree_file] = TocTreeReader(toctree_file, index=index)
+    check_missing_functions(toctree_readers)
+
+    for toctree_file, tt in toctree_readers.items():
+        profiler.set_file(toctree_file)
+        with profiler.timer("toctree"):
+            tt.write_rst_file(output_path)
+        manifest.set_toctree(toctree_file, file_hash(toctree_file), tt.get_titles())
+    write_search_index(os.path.join(output_path, SEARCH_INDEX_FILENAME),
+                       get_search_index(index, shards[0].url, skipped))
+    manifest.save()
+    # The shard files copied with the pages are not part of the build
+    for filename in shard_files:
+        if os.path.samefile(os.path.dirname(os.path.abspath(filename)), output_path):
+            os.remove(filename)
+    return skipped
@@ -0,0 +1,78 @@
+import hashlib
+
+from sphinx.parsers import RSTParser
+
+from src.api import convert
+from src.manifest import CONVERTER_VERSION
+
+# Bump whenever the pages kept in the Sphinx environment change format
+ENV_VERSION = 1
+
+class RdParser(RSTParser):
+    '''
+    RdParser lets Sphinx read the Rd files as source files: each one is
+    converted to RST with convert() when Sphinx reads it, and the RST is
+    parsed as if it were the source file.
+
+    The converted pages are kept in the Sphinx environment with the hash of
+    their Rd file and of the URL, so an Rd file that Sphinx reads again
+    without any change to its content, e.g., after roxygen2::roxygenise()
+    rewrote every file, is not converted again.
+    '''
+    supported = ("rd",)
+
+    def parse(self, inputstring, document):
+        if not isinstance(inputstring, str):
+            inputstring = "\n".join(inputstring)
+        env = document.settings.env
+        rst = get_page(env, env.docname, inputstring, env.config.rd2sphinxrst_url)
+        super().parse(rst, document)
+
+def get_page(env, docname, rd_text, url):
+    '''
+    Returns the RST page of the Rd file of docname, from the environment if
+    it was already converted.
+    '''
+    digest = hashlib.sha256("{}\0{}".format(url, rd_text).encode("utf-8")).hexdigest()
+    pages = env.rd2sphinxrst_pages
+    if docname in pages and pages[docname][0] == digest:
+        return pages[docname][1]
+    rst = convert(rd_text, url)
+    pages[docname] = (digest, rst)
+    return rst
+
+def init_pages(app, env, docnames):
+    '''
+    Creates the cache of the pages in a new environment, and drops the pages
+    of the Rd files that were removed.
+    '''
+    if not hasattr(env, "rd2sphinxrst_pages"):
+        env.rd2sphinxrst_pages = {}
+    for docname in list(env.rd2sphinxrst_pages):
+        if docname not in env.found_docs:
+            del env.rd2sphinxrst_pages[docname]
+
+def merge_pages(app, env, docnames, other):
+    '''
+    Adds the pages converted by a parallel reader process to the environment
+    of the main process.
+    '''
+    for docname in docnames:
+        if docname in other.rd2sphinxrst_pages:
+            env.rd2sphinxrst_pages[docname] = other.rd2sphinxrst_pages[docname]
+
+def setup(app):
+    '''
+    Sphinx extension converting the .Rd source files. Add "src.sphinx_extension"
+    to the extensions in conf.py, with the directory of Rd2SphinxRst in
+    sys.path, and set rd2sphinxrst_url to the URL of the repository.
+    '''
+    app.add_config_value("rd2sphinxrst_url", "", "env")
+    app.add_source_suffix(".Rd", "rd")
+    app.add_source_parser(RdParser)
+    app.connect("env-before-read-docs", init_pages)
+    app.connect("env-merge-info", merge_pages)
+    return {"version": CONVERTER_VERSION,
+            "env_version": ENV_VERSION,
+            "parallel_read_safe": True,
+            "parallel_write_safe": True}
@@ -2,7 +2,38 @@ import json
 import textwrap
 import os
 
-from tabulate import tabulate
+from src.file_writer import write_file
+from src.function_index import FunctionIndex
+from src.rst_table import rst_table
+
+class MissingFunctionError(Exception):
+    '''
+    Raised when toctree files refer to functions without an Rd file.
+
+    Parameter:
+    ----------
+    missing: {str: [str]}
+        Missing functions of each toctree file
+    '''
+    def __init__(self, missing):
+        self.missing = missing
+        lines = ["{}: {}".format(filename, ", ".join(functions))
+                 for filename, functions in sorted(missing.items())]
+        super().__init__("Functions without an Rd file:\n" + "\n".join(lines))
+
+def check_missing_functions(toctree_readers):
+    '''
+    Raises a MissingFunctionError listing the functions of the API tables of
+    the toctree files, given as {filename: TocTreeReader}, that are not in
+    their index.
+    '''
+    missing = {}
+    for toctree_file, tt in toctree_readers.items():
+        missing_functions = tt.get_missing_functions()
+        if missing_functions:
+            missing[toctree_file] = missing_functions
+    if missing:
+        raise MissingFunctionError(missing)
 
 class TocTreeReader:
     '''
@@ -16,15 +47,26 @@ class TocTreeReader:
     rd_readers: [RDReader]
         List of RD reader files reading all the used RD files
 
+    index: FunctionIndex
+        Index of the functions, can be given instead of rd_readers so that the
+        RDReaders do not have to be kept in memory. It is not copied, so one
+        index can be shared by all the toctree files.
+
     '''
-    def __init__(self, filename, rd_readers):
+    def __init__(self, filename, rd_readers=None, index=None):
         self.filename = filename
         with open(self.filename) as json_file:
             self.toctree = json.load(json_file)
-        self.rd_readers_dict = {}
-        for i in rd_readers:
-            filename = os.path.basename(i.filename).replace(".Rd", "")
-            self.rd_readers_dict[filename] = i
+        # A function is often listed by several subsections, e.g., hidden and
+        # printed, the reader is kept by the builds so each name is kept once
+        names = {}
+        for subsection in self.get_subsections():
+            if subsection["type"] == "General":
+                subsection["functions"] = [names.setdefault(name, name)
+                                           for name in subsection["functions"]]
+        if index is None:
+            index = FunctionIndex(rd_reader.get_summary() for rd_reader in rd_readers)
+        self.index = index
 
     def dedent(func):
         '''
@@ -43,6 +85,50 @@ class TocTreeReader:
             return func(*args, **kwargs).replace("\n", "\n        ")
         return add_indentation_to_new_line
 
+    def get_subsections(self):
+        '''
+        Returns every section listing functions, i.e. the sections and the
+        subsections of the "General-sub" sections.
+        '''
+        subsections = []
+        for section in self.toctree["sections"]:
+            if section["type"] == "General-sub":
+                subsections.extend(section["subsection"])
+            else:
+                subsections.append(section)
+        return subsections
+
+    def get_api_functions(self):
+        '''
+        Returns the functions listed in the API tables of the toctree, i.e. the
+        functions whose title is printed on the page.
+        '''
+        functions = []
+        for subsection in self.get_subsections():
+            if subsection["print_api"]:
+                functions.extend(subsection["functions"])
+        return functions
+
+    def get_missing_functions(self):
+        '''
+        Returns the functions of the API tables that are not in the index. The
+        other toctree entries may be hand-written pages, they are not checked.
+        '''
+        return self.index.get_missing(self.get_api_functions())
+
+    def get_titles(self):
+        '''
+        Returns the title of every function printed in the API tables.
+        '''
+        return {function: self.index.get_title(function)
+                for function in self.get_api_functions()}
+
+    def get_output_filename(self):
+        '''
+        Returns the name of the RST file built from the JSON file.
+        '''
+        return os.path.basename(self.filename).replace(".json", ".rst")
+
     @dedent
     def get_section_title(self, section, underline_type):
         if len(section["title"]) > 0:
@@ -62,11 +148,10 @@ class TocTreeReader:
         if section["print_api"]:
             apis = []
             for function in section["functions"]:
-                rd = self.rd_readers_dict[function]
-                value = rd.data["title"].string
+                value = self.index.get_title(function)
                 key = ":doc: `{function} <./{function}>`".format(function=function)
                 apis.append([key, value])
-            return "\n"+tabulate(apis, tablefmt="rst")
+            return "\n"+rst_table(apis)
         else:
             return ""
 
@@ -130,9 +215,9 @@ class TocTreeReader:
             output_section_strings += section_str
         return textwrap.dedent(output_section_strings)
         
-    def write_rst_file(self, directory):
+    def get_rst(self):
         '''
-        Function to write the file into storage.
+        Returns the RST page of the toctree.
         '''
         title = self.toctree["title"]
         sections = self.get_sections()
@@ -146,10 +231,11 @@ class TocTreeReader:
            :disqus_identifier: {identifier}
         '''.format(title=title, sections=sections,
                    identifier=identifier)
-        rst_string = textwrap.dedent(rst_string)
+        return textwrap.dedent(rst_string)
 
-        output_basename = os.path.basename(self.filename).replace(".json", ".rst")
-        
-        with open(os.path.join(directory, output_basename), 'w') as f:
-            f.write(rst_string)
+    def write_rst_file(self, directory):
+        '''
+        Function to write the file into storage.
+        '''
+        write_file(os.path.join(directory, self.get_output_filename()), self.get_rst())
 
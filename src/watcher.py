@@ -0,0 +1,146 @@
+import glob
+import os
+import time
+import traceback
+
+class Watcher:
+    '''
+    Watcher keeps a ManReader and its last build in memory and polls the Rd
+    and toctree directories for changes. A burst of changes, e.g., from
+    roxygen2::roxygenise(), is debounced: the rebuild only starts once no
+    file changed for `debounce` seconds, and then converts only the files
+    that changed plus the toctree pages depending on their titles.
+
+    Polling only uses os.stat, so it works on every platform and file system.
+
+    Usage:
+        mr = ManReader(path_to_rd_files)
+        Watcher(mr, path_to_rd_files, path_to_toctree_files, path_to_save_rsts).run()
+
+    Parameter:
+    ----------
+    man_reader: (ManReader)
+        Reader of the Rd files
+
+    man_dir: (str)
+        Directory of the Rd files
+
+    toctree_dir: (str)
+        Directory of the toctree JSON files
+
+    output_path: (str)
+        Location to save the RST files
+
+    url: (str)
+        URL of the repository
+
+    interval: (float)
+        Seconds between two polls
+
+    debounce: (float)
+        Seconds without changes to wait for before rebuilding
+    '''
+    def __init__(self, man_reader, man_dir, toctree_dir, output_path, url="",
+                 interval=0.5, debounce=0.5):
+        self.man_reader = man_reader
+        self.man_dir = man_dir
+        self.toctree_dir = toctree_dir
+        self.output_path = output_path
+        self.url = url
+        self.interval = interval
+        self.debounce = debounce
+        self.snapshot = {}
+
+    def get_snapshot(self):
+        '''
+        Returns {path: (mtime, size)} of every Rd and toctree JSON file.
+        '''
+        snapshot = {}
+        for pattern in [os.path.join(self.man_dir, "*.Rd"),
+                        os.path.join(self.toctree_dir, "*.json")]:
+            for filename in glob.glob(pattern):
+                try:
+                    stat = os.stat(filename)
+                except FileNotFoundError:
+                    continue
+                snapshot[filename] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def get_changes(self, snapshot):
+        '''
+        Returns the files changed or added and the files removed since the
+        last snapshot.
+        '''
+        changed = [f for f, stat in snapshot.items() if self.snapshot.get(f) != stat]
+        removed = [f for f in self.snapshot if f not in snapshot]
+        return changed, removed
+
+    def wait_for_changes(self):
+        '''
+        Blocks until files changed and stayed unchanged for `debounce` seconds.
+        Returns the changed and removed files.
+        '''
+        while True:
+            time.sleep(self.interval)
+            snapshot = self.get_snapshot()
+            if snapshot == self.snapshot:
+                continue
+
+            # Wait for the burst of changes to end
+            last_change = time.monotonic()
+            while time.monotonic() - last_change < self.debounce:
+                time.sleep(self.interval)
+                latest_snapshot = self.get_snapshot()
+                if latest_snapshot != snapshot:
+                    snapshot = latest_snapshot
+                    last_change = time.monotonic()
+
+            changes = self.get_changes(snapshot)
+            self.snapshot = snapshot
+            return changes
+
+    def rebuild(self, changed, removed):
+        '''
+        Convert the changed files and update the toctree pages.
+        '''
+        mr = self.man_reader
+        mr.filenames = sorted(f for f in self.snapshot if f.endswith(".Rd"))
+        rd_files = sorted(f for f in changed if f.endswith(".Rd"))
+        toctree_files = sorted(f for f in changed if f.endswith(".json"))
+        mr.update(self.output_path, self.url, rd_files, toctree_files, removed)
+        return rd_files, toctree_files
+
+    def print_skipped(self, rd_files):
+        '''
+        Reports the given Rd files that the last build skipped.
+        '''
+        skipped = self.man_reader.skipped
+        for filename in sorted(rd_files):
+            if filename in skipped:
+                print("Skipped {}: {}".format(filename, skipped[filename]))
+
+    def run(self, force=False):
+        '''
+        Build everything once, then rebuild on every change until interrupted.
+        '''
+        self.snapshot = self.get_snapshot()
+        self.man_reader.write_rst(self.output_path, self.toctree_dir, url=self.url,
+                                  force=force)
+        self.print_skipped(self.man_reader.skipped)
+        print("Watching {} and {}".format(self.man_dir, self.toctree_dir))
+        try:
+            while True:
+                changed, removed = self.wait_for_changes()
+                start = time.perf_counter()
+                try:
+                    rd_files, toctree_files = self.rebuild(changed, removed)
+                except Exception:
+                    # Keep watching, the next change may fix the error
+                    traceback.print_exc()
+                    continue
+                print("Rebuilt {} Rd and {} toctree files, {} removed, in {:.2f}s".format(
+                    len(rd_files), len(toctree_files), len(removed),
+                    time.perf_counter() - start))
+                self.print_skipped(rd_files)
+        except KeyboardInterrupt:
+            pass